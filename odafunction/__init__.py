@@ -2,6 +2,7 @@ from collections import OrderedDict
 import json
 from typing import Any, List
 import inspect
+import threading
 
 import logging
 
@@ -12,6 +13,10 @@ logger = logging.getLogger(__name__)
 # sometimes, as the progress is made, code develops its own autonomous logic. it's reconciliation, harmony, and creation
 
 rdf_prefix = "<http://odahub.io/ontology/odafunction#>"
+
+# repr of functions nested in provenance
+max_repr_depth = 3
+_repr_nesting = threading.local()
         
 
 class Function:
@@ -38,19 +43,43 @@ class Function:
         raise NotImplementedError
 
     def __repr__(self) -> str:
+        # provenance holds the functions it was applied to, as deep as the chain which built it: nested ones are only shown to few levels
+        depth = getattr(_repr_nesting, 'depth', 0)
+
+        if depth >= max_repr_depth:
+            return f"[{self.__class__.__name__}]..."
+
+        _repr_nesting.depth = depth + 1
+
         try:
-            sig = self.signature
-        except (NotImplementedError, TypeError):
-            sig = None
+            try:
+                sig = self.signature
+            except (NotImplementedError, TypeError):
+                sig = None
 
-        r = f"[{self.__class__.__name__}]"
-        if sig:
-            r += f"[{sig}]"
-        
-        if self.provenance:
-            r += f"[prov: {self.provenance}]"
+            r = f"[{self.__class__.__name__}]"
+            if sig:
+                r += f"[{sig}]"
+            
+            if self.provenance:
+                r += f"[prov: {self.provenance}]"
+
+            return r
+        finally:
+            _repr_nesting.depth = depth
+
+
+def partial_application(func: Function):
+    """
+    (base function, args, kwargs) if func is a partially applied function, else None
+    """
+    provenance = func.provenance or []
 
-        return r
+    if len(provenance) == 1 and isinstance(provenance[0], tuple) and provenance[0][0] == 'partial':
+        _, (_, args), (_, kwargs), (base, _) = provenance[0]
+        return base, args, kwargs
+
+    return None
 
 
 class FunctionCatalog:
@@ -84,8 +113,22 @@ class Executor:
 
 
 class LocalPythonFunction(Function):
-    def __init__(self, local_python_function, provenance=None) -> None:
+    # opt-in: results of partial applications of this function are kept in memory by LocalExecutor
+    memoize = False
+
+    # opt-in: implementation taking each argument as list of values of many calls, and returning list of results.
+    # may also be set as attribute "batched" of the python function itself
+    batched = None
+
+    def __init__(self, local_python_function, provenance=None, memoize=None, batched=None) -> None:
         self.local_python_function = local_python_function
+
+        if memoize is not None:
+            self.memoize = memoize
+
+        if batched is not None:
+            self.batched = batched
+
         super().__init__(provenance=provenance)    
 
     @property
@@ -101,9 +144,9 @@ class LocalPythonFunction(Function):
         
         def f():
             # TODO: these assumptions about executor are not universal
-            from .executors import default_execute_to_value
-            args = [default_execute_to_value(a) for a in ba.args]
-            kwargs = {k: default_execute_to_value(v) for k, v in ba.kwargs.items()}
+            # nested functions are executed with options of the outer execution context
+            from .executors import evaluate_arguments
+            args, kwargs = evaluate_arguments(ba.args, ba.kwargs)
             return self.local_python_function(*args, **kwargs)
 
         return LocalPythonFunction(f, provenance=F.provenance)
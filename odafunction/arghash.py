@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import threading
+import types
+
+
+logger = logging.getLogger(__name__)
+
+# digest of function arguments, used in URIs of partially applied functions and in memo keys.
+# JSON-compatible arguments are hashed as their JSON encoding, so that URIs derived before stay the same.
+# other arguments are replaced by canonical tokens: buffers (bytes, numpy arrays) by digest of their raw memory, without copying,
+# functions by their URI or provenance, and registered types by whatever their hasher returns
+
+# type: callable returning canonical JSON-compatible representation, which may itself contain any hashable arguments
+argument_hashers = {}
+
+
+def register_argument_hasher(cls, hasher=None):
+    """
+    register canonical representation for arguments of type cls; usable as decorator of the hasher
+    """
+    def register(hasher):
+        argument_hashers[cls] = hasher
+        return hasher
+
+    if hasher is None:
+        return register
+
+    return register(hasher)
+
+
+def buffer_digest(mv: memoryview):
+    h = hashlib.sha256()
+
+    if mv.c_contiguous:
+        h.update(mv)
+    else:
+        # strided views can not be hashed in place
+        h.update(mv.tobytes())
+
+    return h.hexdigest()
+
+
+def code_digest(code):
+    # names are part of what code does: same bytecode may read other attributes or globals. nested code, e.g. of lambdas, is hashed in place of its repr, which has the address
+    h = hashlib.sha256(code.co_code)
+
+    for names in [code.co_names, code.co_varnames, code.co_freevars]:
+        h.update(repr(names).encode())
+
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            h.update(code_digest(const).encode())
+        else:
+            h.update(repr(const).encode())
+
+    return h.hexdigest()
+
+
+def code_names(code):
+    names = set(code.co_names)
+
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+
+    return names
+
+
+def reference_token(value):
+    """
+    token of a value referenced by function code, as global or from closure
+    """
+    if isinstance(value, types.ModuleType):
+        return {'__module__': value.__name__}
+
+    if callable(value) and hasattr(value, '__qualname__') and getattr(_tokenizing, 'functions', None) and id(value) in _tokenizing.functions:
+        # recursive reference
+        return {'__callable__': f"{getattr(value, '__module__', '')}.{value.__qualname__}"}
+
+    try:
+        return {'__digest__': argument_digest(value)}
+    except (TypeError, ValueError):
+        return {'__unhashable__': f"{type(value).__module__}.{type(value).__qualname__}"}
+
+
+_tokenizing = threading.local()
+
+
+def python_function_token(f):
+    # stable across processes, unlike id or repr: same code, defaults, referenced globals and closure give the same token
+    code = getattr(f, '__code__', None)
+
+    if code is None:
+        return {'__callable__': f"{getattr(f, '__module__', '')}.{getattr(f, '__qualname__', type(f).__qualname__)}"}
+
+    if not hasattr(_tokenizing, 'functions'):
+        _tokenizing.functions = set()
+
+    _tokenizing.functions.add(id(f))
+
+    try:
+        f_globals = getattr(f, '__globals__', {})
+        closure = []
+
+        for cell in f.__closure__ or []:
+            try:
+                closure.append(reference_token(cell.cell_contents))
+            except ValueError:
+                # cell not yet assigned
+                closure.append(None)
+
+        return {
+            '__callable__': f"{f.__module__}.{f.__qualname__}",
+            'code': code_digest(code),
+            'defaults': reference_token(f.__defaults__),
+            'kwdefaults': reference_token(f.__kwdefaults__),
+            'globals': {name: reference_token(f_globals[name]) for name in sorted(code_names(code)) if name in f_globals},
+            'closure': closure,
+        }
+    finally:
+        _tokenizing.functions.discard(id(f))
+
+
+def canonical_token(obj):
+    """
+    JSON-compatible replacement for an argument which is not JSON-compatible, or TypeError
+    """
+    # imported here: function module imports this one
+    from . import Function, Executor
+
+    for cls in type(obj).__mro__:
+        if cls in argument_hashers:
+            return argument_hashers[cls](obj)
+
+    if isinstance(obj, Function):
+        if getattr(obj, 'uri', None) is not None:
+            return {'__uri__': str(obj.uri)}
+
+        if len(obj.provenance or []) > 0:
+            return {'__function__': obj.__class__.__name__, 'provenance': obj.provenance}
+
+        return {'__function__': obj.__class__.__name__, 'python': getattr(obj, 'local_python_function', None)}
+
+    if isinstance(obj, Executor):
+        return {'__executor__': obj.__class__.__name__}
+
+    if callable(obj) and hasattr(obj, '__qualname__'):
+        return python_function_token(obj)
+
+    if isinstance(obj, (bytes, bytearray)):
+        return {'__bytes__': buffer_digest(memoryview(obj)), 'size': len(obj)}
+
+    if isinstance(obj, (set, frozenset)):
+        return {'__set__': sorted(argument_digest(e) for e in obj)}
+
+    try:
+        mv = memoryview(obj)
+    except TypeError:
+        mv = None
+
+    if mv is not None:
+        # numpy scalars and 0-d arrays are hashed as the plain value
+        if mv.ndim == 0 and hasattr(obj, 'item'):
+            return obj.item()
+
+        return {
+            '__buffer__': buffer_digest(mv),
+            'type': f"{type(obj).__module__}.{type(obj).__qualname__}",
+            'dtype': str(getattr(obj, 'dtype', mv.format)),
+            'shape': list(mv.shape),
+        }
+
+    raise TypeError(f"can not hash argument of type {type(obj)}: {obj!r:.100}, consider register_argument_hasher")
+
+
+def argument_digest(obj, algorithm="md5"):
+    """
+    hex digest of canonical encoding of obj; dict keys are sorted
+    """
+    # C encoder, falls back to canonical tokens only for what is not JSON. large buffers are replaced by their digest, so the encoding stays small
+    encoded = json.dumps(obj, sort_keys=True, default=canonical_token)
+
+    return hashlib.new(algorithm, encoded.encode()).hexdigest()
@@ -1,23 +1,130 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from . import FunctionCatalog, Function, LocalValue
-from .func.urifunc import URIValue
+from .func.urifunc import URIValue, URIFunction
 from .executors import default_execute_to_value
 
 
+logger = logging.getLogger(__name__)
+
+
 class FunctionCatalogKeyedLocalValued(FunctionCatalog):
+    """
+    catalog of functions by key
+
+    functions can be added constructed, or by URI only: these are materialized on first lookup
+    """
+
+    snapshot_format_version = 1
+
     def __init__(self) -> None:
         self.catalog = {}
+        self.uris = {}
+        self.metadata = {}
+        self._materialize_locks = {}
+        self._locks_lock = threading.Lock()
 
     def add(self, key, func):
         self.catalog[key] = func
+        # replaced entry: snapshot should have the URI of the new function
+        self.uris.pop(key, None)
+
+    def add_uri(self, key, uri, metadata=None):
+        self.uris[key] = str(uri)
+        self.metadata[key] = dict(metadata or {})
+        self.catalog.pop(key, None)
+
+    def keys(self):
+        return sorted(set(self.catalog) | set(self.uris))
+
+    def is_materialized(self, key):
+        return key in self.catalog
+
+    def materialize(self, key):
+        if key in self.catalog:
+            return self.catalog[key]
+
+        if key not in self.uris:
+            raise KeyError(key)
+
+        with self._locks_lock:
+            lock = self._materialize_locks.setdefault(key, threading.Lock())
+
+        # concurrent lookups (e.g. with prefetch) wait for the one which is loading
+        with lock:
+            if key not in self.catalog:
+                logger.info("materializing %s from %s", key, self.uris[key])
+                self.catalog[key] = URIFunction.from_uri(self.uris[key])
 
-    def find(self, key):
         return self.catalog[key]
-    
+
+    def find(self, key):
+        return self.materialize(key)
+
+    def prefetch(self, keys=None, max_workers=4, wait=False):
+        if keys is None:
+            keys = [k for k in self.keys() if not self.is_materialized(k)]
+
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="odaf-prefetch")
+        futures = {k: pool.submit(self.materialize, k) for k in keys}
+        pool.shutdown(wait=wait)
+
+        return futures
+
+    def dump_snapshot(self, path):
+        functions = {}
+
+        for key in self.keys():
+            if key in self.uris:
+                uri = self.uris[key]
+            elif hasattr(self.catalog[key], 'uri'):
+                uri = str(self.catalog[key].uri)
+            else:
+                logger.warning("function %s has no URI, it can not be stored in a snapshot", key)
+                continue
+
+            functions[key] = {'uri': uri, 'metadata': self.metadata.get(key, {})}
+
+        with open(path, "w") as f:
+            json.dump({'version': self.snapshot_format_version, 'functions': functions}, f, sort_keys=True)
+
+        logger.info("stored catalog snapshot with %s functions to %s", len(functions), path)
+
+    @classmethod
+    def from_snapshot(cls, path, prefetch=None, max_workers=4):
+        """
+        load catalog which only knows URIs, functions are materialized on lookup
+
+        prefetch: list of keys to materialize in background, or True for all
+        """
+
+        with open(path) as f:
+            snapshot = json.load(f)
+
+        if snapshot.get('version') != cls.snapshot_format_version:
+            raise RuntimeError(f"unsupported catalog snapshot version {snapshot.get('version')} in {path}")
+
+        catalog = cls()
+        for key, entry in snapshot['functions'].items():
+            catalog.add_uri(key, entry['uri'], entry.get('metadata', {}))
+
+        logger.info("loaded catalog snapshot with %s functions from %s", len(snapshot['functions']), path)
+
+        if prefetch is True:
+            catalog.prefetch(max_workers=max_workers)
+        elif prefetch:
+            catalog.prefetch(prefetch, max_workers=max_workers)
+
+        return catalog
+
 
 class FunctionCatalogKeyedLocalValuedAttrs(FunctionCatalogKeyedLocalValued):
     def __getattr__(self, __name: str) -> callable:
-        if __name in self.catalog:
-            func = self.catalog[__name]
+        if __name in self.__dict__.get('catalog', {}) or __name in self.__dict__.get('uris', {}):
+            func = self.materialize(__name)
 
             def f(*args, **kwds):
                 f0 = func(*args, **kwds)
@@ -25,10 +132,9 @@ class FunctionCatalogKeyedLocalValuedAttrs(FunctionCatalogKeyedLocalValued):
 
             return f
 
-        return super().__getattr__(__name)    
+        return super().__getattr__(__name)
 
 
 # class FunctionCatalogAsItems(FunctionCatalogKeyed):
-#     def __getitem__(self, key):    
+#     def __getitem__(self, key):
 #         return self.catalog[key]
-            
\ No newline at end of file
@@ -1,5 +1,9 @@
 import click
+import json
 import logging
+import os
+import signal
+import threading
 
 from rich.logging import RichHandler
 from rich.highlighter import RegexHighlighter, NullHighlighter
@@ -7,7 +11,17 @@ from rich.highlighter import RegexHighlighter, NullHighlighter
 from .utils import repr_trim
 
 from . import logs
-from .executors import default_execute_to_value
+from .executors import default_execute_to_value, LocalURICachingExecutor
+from .executors.workqueue import QueueExecutor, run_worker, default_lease_time
+from .executors.cachetiers import CacheTier
+from .executors.planner import ExecutionPlanner
+from .executors.isolated import IsolatedExecutor
+from .executors.profiling import ProfileStore
+from .executors.batch import BatchRunner, result_json_default
+from .context import execution_context
+from .daemon import OdafunctionDaemon, DaemonClient
+from .catalogviews import FunctionCatalogKeyedLocalValued
+from .func.mirror import FunctionMirror
 from .func.urifunc import URIFunction, URIValue, LocalValue
 
 class MyRegexHighlighter(RegexHighlighter):
@@ -25,7 +39,8 @@ class MyRegexHighlighter(RegexHighlighter):
 @click.option('-v', is_flag=True)
 @click.option('-vv', is_flag=True)
 @click.option('-l', '--logspec', default=None)
-def main(v, vv, logspec):
+@click.pass_context
+def main(ctx, v, vv, logspec):
     if vv:
         level = 'DEBUG'
     elif v:
@@ -33,19 +48,7 @@ def main(v, vv, logspec):
     else:
         level = 'WARNING'
     
-    logging.basicConfig(
-        level=level, 
-        datefmt="[%X]",
-        force=True,
-        format="%(name)30s %(levelname)8s %(message)s"
-    )
-    
-    logging.getLogger().info("test info")
-    
-    if logspec is not None:        
-        logs.app_logging.parse_logspec(logspec)
-
-    logs.app_logging.setup()
+    ctx.call_on_close(logs.configure_cli_logging(level, logspec))
 
 
 @main.command()
@@ -53,18 +56,258 @@ def main(v, vv, logspec):
 @click.option("-nc", "--no-cache", is_flag=True)
 @click.option("-i", "--inplace", is_flag=True)
 @click.option("-u", "--urivalue", is_flag=True)
-def run(uri, no_cache, inplace, urivalue):
+@click.option("-q", "--queue", default=None, help="submit to job queue (directory or .sqlite file) and wait for a worker")
+@click.option("-p", "--plan", is_flag=True, help="let execution planner decide whether to use cache, and report the decision")
+@click.option("--timeout", type=float, default=None, help="run in isolated subprocess, with wall-clock limit in seconds")
+@click.option("--memory-limit", type=int, default=None, help="run in isolated subprocess, with memory budget in MB")
+@click.option("--cpu-limit", type=float, default=None, help="run in isolated subprocess, with CPU time limit in seconds")
+@click.option("-d", "--daemon", default=None, envvar="ODAFUNCTION_DAEMON", help="execute in running daemon: unix:SOCKET or http://HOST:PORT")
+@click.option("--profile", is_flag=True, help="record cProfile of each execution, see `odaf profiles`")
+@click.option("--profile-memory", is_flag=True, help="record cProfile and tracemalloc snapshot of each execution")
+def run(uri, no_cache, inplace, urivalue, queue, plan, timeout, memory_limit, cpu_limit, daemon, profile, profile_memory):
+
+    if daemon is not None:
+        # thin client: function is loaded and executed by the daemon, which only knows how to cache
+        unsupported = [option for option, value in [
+            ("--queue", queue is not None),
+            ("--plan", plan),
+            ("--timeout", timeout is not None),
+            ("--memory-limit", memory_limit is not None),
+            ("--cpu-limit", cpu_limit is not None),
+            ("--profile", profile),
+            ("--profile-memory", profile_memory),
+        ] if value]
+
+        if unsupported:
+            raise click.UsageError(f"{', '.join(unsupported)} can not be used with --daemon")
+
+        result = DaemonClient(daemon).run(uri, cached=not no_cache, urivalue=urivalue)
+        logging.info("function returns: %s", repr_trim(result.get('value_uri', result.get('value'))))
+        return
 
     f = URIFunction.from_uri(uri)()
 
+    if profile_memory:
+        profile = "memory"
+
+    with execution_context(profile=profile or None):
+        _run(f, no_cache, urivalue, queue, plan, timeout, memory_limit, cpu_limit)
+
+
+def _run(f, no_cache, urivalue, queue, plan, timeout, memory_limit, cpu_limit):
+
     # TODO: inplace should be executor option!
     # f.inplace = inplace
 
-    v = default_execute_to_value(f, 
-                                 cached=not no_cache, 
-                                 valueclass=URIValue if urivalue else LocalValue)
+    if queue is not None:
+        v = QueueExecutor(queue)(f).value
+    elif any(limit is not None for limit in [timeout, memory_limit, cpu_limit]):
+        ex = IsolatedExecutor(timeout=timeout, 
+                              memory_limit=None if memory_limit is None else memory_limit * 1024 * 1024, 
+                              cpu_limit=cpu_limit)
+        try:
+            v = ex(f).value
+        finally:
+            click.echo(json.dumps(ex.last_report, sort_keys=True))
+    elif plan:
+        planner = ExecutionPlanner()
+        v = default_execute_to_value(f, 
+                                     cached=not no_cache, 
+                                     valueclass=URIValue if urivalue else LocalValue,
+                                     planner=planner)
+        for decision in planner.decisions:
+            click.echo(json.dumps(decision.to_dict(), sort_keys=True))
+    else:
+        v = default_execute_to_value(f, 
+                                     cached=not no_cache, 
+                                     valueclass=URIValue if urivalue else LocalValue)
     logging.info("function returns: %s", repr_trim(v))    
 
 
+@main.command("run-many")
+@click.argument("input", type=click.File("r"), default="-")
+@click.option("-j", "--jobs", type=int, default=4, help="number of requests executed in parallel")
+@click.option("-nc", "--no-cache", is_flag=True)
+@click.option("-u", "--urivalue", is_flag=True, help="output value URIs instead of values")
+def run_many(input, jobs, no_cache, urivalue):
+    """
+    execute requests read as JSON lines {"uri": ..., "args": [...], "kwargs": {...}, "id": ...} from INPUT (stdin by default),
+    and write results as JSON lines as they complete
+    """
+    def requests():
+        for line in input:
+            if line.strip() != "":
+                yield json.loads(line)
+
+    n_failed = 0
+    for result in BatchRunner(parallel=jobs, cached=not no_cache, urivalue=urivalue).run(requests()):
+        n_failed += 'error' in result
+        click.echo(json.dumps(result, default=result_json_default))
+
+    logging.info("run-many: %s requests failed", n_failed)
+
+
+@main.command()
+@click.option("-s", "--socket", "socket_path", default=None, help="unix socket to listen on, by default ~/.cache/odafunction/daemon.sock")
+@click.option("--host", default=None, help="listen on http instead of unix socket; clients need the token, generated and shown if not given")
+@click.option("--port", type=int, default=None)
+@click.option("--token", default=None, envvar="ODAFUNCTION_DAEMON_TOKEN", help="require clients to present this token")
+@click.option("-nc", "--no-cache", is_flag=True, help="do not cache by default; requests may still ask for it")
+def serve(socket_path, host, port, token, no_cache):
+    """
+    keep functions, cache and executors loaded, and execute requests from `odaf run --daemon`
+    """
+    daemon = OdafunctionDaemon(socket_path=socket_path, host=host, port=port, runner=BatchRunner(cached=not no_cache), token=token)
+
+    # finish requests in progress and remove the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=daemon.server.shutdown, daemon=True).start())
+
+    if token is None and daemon.token is not None:
+        click.echo(json.dumps({'address': daemon.address, 'token': daemon.token}))
+    else:
+        click.echo(json.dumps({'address': daemon.address}))
+    daemon.serve_forever()
+
+
+@main.command()
+@click.argument("queue")
+@click.option("-nc", "--no-cache", is_flag=True)
+@click.option("-n", "--max-jobs", type=int, default=None)
+@click.option("--idle-timeout", type=float, default=None, help="stop after this many seconds without jobs")
+@click.option("--poll-interval", type=float, default=1.)
+@click.option("--lease-time", type=float, default=default_lease_time, help="jobs of workers silent for this many seconds are given to others")
+def worker(queue, no_cache, max_jobs, idle_timeout, poll_interval, lease_time):
+    n_done = run_worker(queue, 
+                        cached=not no_cache, 
+                        max_jobs=max_jobs, 
+                        idle_timeout=idle_timeout, 
+                        poll_interval=poll_interval,
+                        lease_time=lease_time)
+    logging.info("worker done %s jobs", n_done)
+
+
+@main.command("plan-stats")
+def plan_stats():
+    """
+    show execution statistics recorded by the planner
+    """
+    planner = ExecutionPlanner()
+    for func_key, stats in sorted(planner.stats.items()):
+        click.echo(f"{func_key}: {json.dumps(planner.estimate(func_key), sort_keys=True)} runs: {stats.get('n_runs', 0)}")
+
+
+@main.group()
+def profiles():
+    pass
+
+
+@profiles.command("list")
+@click.option("-n", type=int, default=10)
+@click.option("-m", "--match", default=None, help="only functions with URI containing this")
+def profiles_list(n, match):
+    """
+    slowest recorded executions
+    """
+    for entry in ProfileStore().slowest(n, match):
+        memory = f" memory: {entry['memory']['total']}" if 'memory' in entry else ""
+        click.echo(f"{entry['duration']:10.3f} s {entry['uri']}{memory}\n             {entry['profile'] or 'only timed'}")
+
+
+@profiles.command("show")
+@click.argument("profile")
+@click.option("-s", "--sort", default="cumulative")
+@click.option("-n", type=int, default=30)
+def profiles_show(profile, sort, n):
+    """
+    print PROFILE: path to .prof file, or index in the list of the slowest
+    """
+    store = ProfileStore()
+
+    if profile.isdigit():
+        entries = store.slowest(int(profile) + 1)
+
+        if int(profile) >= len(entries):
+            raise click.ClickException(f"there are only {len(entries)} recorded profiles, see `odaf profiles list`")
+
+        entry = entries[int(profile)]
+        profile = entry['profile']
+
+        for allocation in entry.get('memory', {}).get('top', []):
+            click.echo(f"{allocation['size']:12d} B {allocation['count']:8d} {allocation['where']}")
+
+        if profile is None:
+            raise click.ClickException(f"execution of {entry['uri']} overlapped with another profiled one, and was only timed: {entry['duration']:.3f} s")
+
+    if not os.path.exists(profile):
+        raise click.ClickException(f"no profile {profile}")
+
+    click.echo(store.report(profile, sort, n))
+
+
+@main.group()
+def cache():
+    pass
+
+
+@cache.command()
+@click.argument("function_uri", required=False)
+def invalidate(function_uri):
+    """
+    forget cached results depending on FUNCTION_URI, or, if not given, on any local function which changed
+    """
+    ex = LocalURICachingExecutor()
+
+    if function_uri is None:
+        n = ex.invalidate_stale()
+    else:
+        n = ex.invalidate(function_uri)
+
+    click.echo(f"invalidated {n} cached results")
+
+
+@cache.command("export")
+@click.argument("tier_path")
+@click.option("-m", "--match", default=None, help="only entries with function URI matching this regex")
+def export_cache(tier_path, match):
+    """
+    publish local cache entries to a shared cache tier directory
+    """
+    n = LocalURICachingExecutor(tiers=[]).export_tier(CacheTier(tier_path, writable=True), match=match)
+    click.echo(f"exported {n} cached results to {tier_path}")
+
+
+@cache.command("import")
+@click.argument("tier_path")
+def import_cache(tier_path):
+    """
+    copy all entries of a shared cache tier directory to local cache
+    """
+    n = LocalURICachingExecutor(tiers=[]).import_tier(CacheTier(tier_path))
+    click.echo(f"imported {n} cached results from {tier_path}")
+
+
+@main.command()
+@click.argument("uris", nargs=-1)
+@click.option("-c", "--catalog", "catalogs", multiple=True, help="catalog snapshot, all remote functions in it are fetched")
+@click.option("-j", "--jobs", type=int, default=8)
+def prefetch(uris, catalogs, jobs):
+    """
+    fetch remote functions to the local mirror, in parallel
+    """
+    uris = list(uris)
+    for catalog in catalogs:
+        uris += FunctionCatalogKeyedLocalValued.from_snapshot(catalog).uris.values()
+
+    mirror = FunctionMirror()
+    results = mirror.prefetch(uris, max_workers=jobs)
+
+    failed = [url for url, r in results.items() if isinstance(r, Exception)]
+    for url, r in results.items():
+        click.echo(f"{url}: {'FAILED ' + repr(r) if url in failed else r['sha256']}")
+
+    if failed:
+        raise click.ClickException(f"failed to fetch {len(failed)} of {len(results)} to {mirror.path}")
+
+
 if __name__ == "__main__":
     main(auto_envvar_prefix="ODAFUNCTION")
\ No newline at end of file
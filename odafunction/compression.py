@@ -0,0 +1,105 @@
+import gzip
+import logging
+import lzma
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# stored values and cache files may be compressed; each file records its codec by its magic bytes, so reads need no configuration
+
+codecs = {
+    'gzip': (b'\x1f\x8b', lambda data: gzip.compress(data, compresslevel=1), gzip.open),
+    'xz': (b'\xfd7zXZ\x00', lambda data: lzma.compress(data, preset=6), lzma.open),
+}
+
+codec_aliases = {
+    'fast': 'gzip',
+    'dense': 'xz',
+}
+
+default_compression_threshold = 64 * 1024
+
+
+def compression_codec(codec=None):
+    """
+    codec by name or alias, by default from ODAFUNCTION_COMPRESSION; None if compression is off
+    """
+    if codec is None:
+        codec = os.getenv("ODAFUNCTION_COMPRESSION", "none")
+
+    codec = codec_aliases.get(codec, codec)
+
+    if codec in ["none", ""]:
+        return None
+
+    if codec not in codecs:
+        raise RuntimeError(f"unknown compression codec {codec}, known are: {', '.join(list(codecs) + list(codec_aliases))}")
+
+    return codec
+
+
+def compression_threshold(threshold=None):
+    if threshold is None:
+        threshold = int(os.getenv("ODAFUNCTION_COMPRESSION_THRESHOLD", default_compression_threshold))
+
+    return threshold
+
+
+def detect_codec(path):
+    with open(path, "rb") as f:
+        head = f.read(max(len(magic) for magic, _, _ in codecs.values()))
+
+    for codec, (magic, _, _) in codecs.items():
+        if head.startswith(magic):
+            return codec
+
+    return None
+
+
+def open_maybe_compressed(path, mode="rt"):
+    """
+    open for reading, decompressing while reading if the file is compressed
+    """
+    codec = detect_codec(path)
+
+    if codec is None:
+        return open(path, mode)
+
+    logger.debug("reading %s compressed with %s", path, codec)
+
+    if 't' in mode:
+        return codecs[codec][2](path, mode, encoding="utf-8")
+    else:
+        return codecs[codec][2](path, mode)
+
+
+def write_maybe_compressed(path, text, codec=None, threshold=None):
+    """
+    write text, compressed if codec is enabled and content is larger than threshold
+    """
+    data = text.encode("utf-8") if isinstance(text, str) else text
+
+    codec = compression_codec(codec)
+
+    if codec is not None and len(data) >= compression_threshold(threshold):
+        compressed = codecs[codec][1](data)
+        logger.debug("compressed %s with %s: %s to %s bytes", path, codec, len(data), len(compressed))
+        data = compressed
+
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def open_for_writing(path, codec=None):
+    """
+    text stream for incremental writing, compressed if codec is enabled: size is not known in advance, so threshold does not apply
+    """
+    codec = compression_codec(codec)
+
+    if codec is None:
+        return open(path, "w")
+    elif codec == 'gzip':
+        return gzip.open(path, "wt", compresslevel=1, encoding="utf-8")
+    else:
+        return codecs[codec][2](path, "wt", encoding="utf-8")
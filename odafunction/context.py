@@ -0,0 +1,64 @@
+import contextlib
+import contextvars
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionContext:
+    """
+    options of the outer execution, which apply to evaluation of all nested functions
+
+    cached: cache policy, if not set by the call
+    valueclass: value class, if not set by the call
+    executor_selector: additional filter on executors
+    planner: ExecutionPlanner
+    pool: concurrent.futures executor, to evaluate arguments of a function in parallel
+    trace: list, collects executed functions with their depth and duration
+    depth: nesting depth of the current evaluation
+    profile: True to record cProfile of each execution, "memory" to also record tracemalloc snapshot
+    """
+
+    options = ['cached', 'valueclass', 'executor_selector', 'planner', 'pool', 'trace', 'depth', 'profile']
+
+    def __init__(self, cached=None, valueclass=None, executor_selector=None, planner=None, pool=None, trace=None, depth=0, profile=None) -> None:
+        self.cached = cached
+        self.valueclass = valueclass
+        self.executor_selector = executor_selector
+        self.planner = planner
+        self.pool = pool
+        self.trace = trace
+        self.depth = depth
+        self.profile = profile
+
+    def replace(self, **options):
+        for k in options:
+            if k not in self.options:
+                raise TypeError(f"unknown execution context option {k}")
+
+        return self.__class__(**{**{k: getattr(self, k) for k in self.options}, **options})
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: " + ", ".join(f"{k}={getattr(self, k)!r}" for k in self.options if getattr(self, k) is not None) + "]"
+
+
+_execution_context = contextvars.ContextVar("odafunction_execution_context", default=ExecutionContext())
+
+
+def current_execution_context() -> ExecutionContext:
+    return _execution_context.get()
+
+
+@contextlib.contextmanager
+def execution_context(**options):
+    """
+    within this block, nested evaluations use these options unless they set their own
+    """
+    context = current_execution_context().replace(**options)
+    token = _execution_context.set(context)
+
+    try:
+        yield context
+    finally:
+        _execution_context.reset(token)
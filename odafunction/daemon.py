@@ -0,0 +1,311 @@
+import hmac
+import http.client
+import json
+import logging
+import os
+import pathlib
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .executors.batch import BatchRunner, result_json_default
+
+
+logger = logging.getLogger(__name__)
+
+# daemon keeps loaded functions, cache graph and executors warm between requests.
+# it listens on a unix socket (default) or on local http; the protocol is the same JSON over HTTP for both.
+#
+# whoever can connect can run any code as the daemon user: the socket is only accessible to the user,
+# and http, even on loopback where any local user can connect, is only served with a token, expected in Authorization: Bearer header
+
+
+def default_socket_path():
+    return pathlib.Path(os.environ['HOME']) / ".cache/odafunction/daemon.sock"
+
+
+def default_token():
+    return os.getenv("ODAFUNCTION_DAEMON_TOKEN")
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    server_version = "odafunction-daemon"
+
+    def address_string(self):
+        # unix socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def reply(self, code, data):
+        body = json.dumps(data, default=result_json_default).encode()
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+
+        if length == 0:
+            return {}
+
+        return json.loads(self.rfile.read(length))
+
+    def authorized(self):
+        token = self.server.daemon.token
+
+        if token is None:
+            return True
+
+        if hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}"):
+            return True
+
+        logger.warning("rejected request from %s without valid token", self.address_string())
+        self.reply(401, {'error': "valid token is required"})
+        return False
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+
+        if self.path == "/status":
+            self.reply(200, self.server.daemon.status())
+        else:
+            self.reply(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+
+        try:
+            request = self.read_json()
+        except ValueError as e:
+            self.reply(400, {'error': f"request is not JSON: {e!r}"})
+            return
+
+        if self.path == "/run":
+            self.reply(200, self.server.daemon.run(request))
+        elif self.path == "/reload":
+            self.reply(200, self.server.daemon.reload())
+        elif self.path == "/shutdown":
+            self.reply(200, {'shutdown': True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self.reply(404, {'error': f"unknown path {self.path}"})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # socket is created accessible only to the user, there is no moment when others could connect
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+
+class OdafunctionDaemon:
+    """
+    serves execution requests {"uri": ..., "args": [...], "kwargs": {...}, "cached": ..., "urivalue": ...}, each in own thread
+
+    functions are loaded once and loaded again when their local source changes; all requests share one caching executor
+
+    token: if set, requests must present it; on http a new one is generated if none is given
+    """
+
+    def __init__(self, socket_path=None, host=None, port=None, runner=None, token=None) -> None:
+        if runner is None:
+            runner = BatchRunner()
+
+        self.runner = runner
+        self.token = token
+        self.started = time.time()
+        self.n_requests = 0
+        self._lock = threading.Lock()
+
+        if host is not None or port is not None:
+            if token is None:
+                self.token = secrets.token_urlsafe(32)
+                logger.info("daemon on http requires a token, generated a new one")
+
+            self.socket_path = None
+            self.server = ThreadingHTTPServer((host or "127.0.0.1", port or 0), DaemonRequestHandler)
+        else:
+            self.socket_path = pathlib.Path(socket_path or default_socket_path())
+            self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+            if self.socket_path.exists():
+                if DaemonClient(f"unix:{self.socket_path}").alive():
+                    raise RuntimeError(f"daemon is already running at {self.socket_path}")
+
+                logger.info("removing stale socket %s", self.socket_path)
+                self.socket_path.unlink()
+
+            self.server = ThreadingUnixHTTPServer(str(self.socket_path), DaemonRequestHandler)
+
+        self.server.daemon = self
+
+    @property
+    def address(self):
+        if self.socket_path is not None:
+            return f"unix:{self.socket_path}"
+
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def run(self, request):
+        with self._lock:
+            self.n_requests += 1
+
+        return self.runner.execute(request)
+
+    def reload(self):
+        """
+        forget loaded functions and re-read the cache graph, e.g. after it was changed by another process
+        """
+        self.runner.forget_functions()
+
+        if self.runner.caching_executor is not None:
+            # entries are saved in batches, those not saved yet would be lost
+            self.runner.caching_executor.flush()
+
+            with self.runner.caching_executor._lock:
+                self.runner.caching_executor.load_cache()
+
+        logger.info("daemon reloaded")
+        return {'reloaded': True}
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'address': self.address,
+            'uptime': time.time() - self.started,
+            'n_requests': self.n_requests,
+            'functions': self.runner.loaded_functions,
+        }
+
+    def serve_forever(self):
+        logger.info("daemon serving at %s", self.address)
+
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        self.server.server_close()
+
+        if self.runner.caching_executor is not None:
+            self.runner.caching_executor.flush()
+
+        if self.socket_path is not None and self.socket_path.exists():
+            self.socket_path.unlink()
+
+        logger.info("daemon at %s stopped after %s requests", self.address, self.n_requests)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(str(self.socket_path))
+
+
+class DaemonClient:
+    """
+    thin client: address is unix:/path/to/socket or http://host:port, by default the default socket
+    """
+
+    def __init__(self, address=None, timeout=None, token=None) -> None:
+        if address is None:
+            address = f"unix:{default_socket_path()}"
+
+        if token is None:
+            token = default_token()
+
+        self.address = address
+        self.timeout = timeout
+        self.token = token
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.address}]"
+
+    def connection(self):
+        if self.address.startswith("unix:"):
+            return UnixHTTPConnection(self.address[len("unix:"):], timeout=self.timeout)
+        elif self.address.startswith("http://"):
+            return http.client.HTTPConnection(self.address[len("http://"):], timeout=self.timeout)
+        else:
+            raise RuntimeError(f"daemon address {self.address} does not look right, expected unix:PATH or http://HOST:PORT")
+
+    def request(self, method, path, data=None):
+        conn = self.connection()
+
+        try:
+            body = None if data is None else json.dumps(data)
+            headers = {"Content-Type": "application/json"}
+
+            if self.token is not None:
+                headers["Authorization"] = f"Bearer {self.token}"
+
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            result = json.loads(response.read())
+        finally:
+            conn.close()
+
+        if response.status != 200:
+            raise RuntimeError(f"daemon {self.address} responded {response.status}: {result.get('error')}")
+
+        return result
+
+    def alive(self):
+        try:
+            self.status()
+        except (OSError, http.client.HTTPException):
+            return False
+
+        return True
+
+    def status(self):
+        return self.request("GET", "/status")
+
+    def reload(self):
+        return self.request("POST", "/reload")
+
+    def shutdown(self):
+        return self.request("POST", "/shutdown")
+
+    def run(self, uri, args=(), kwargs=None, cached=True, urivalue=False):
+        """
+        result as produced by the daemon: {"value": ...} or {"value_uri": ...}; failures raise RuntimeError
+        """
+        result = self.request("POST", "/run", {
+            'uri': uri,
+            'args': list(args),
+            'kwargs': kwargs or {},
+            'cached': cached,
+            'urivalue': urivalue,
+        })
+
+        if 'error' in result:
+            logger.error("daemon failed to execute %s: %s", uri, result.get('traceback'))
+            raise RuntimeError(f"daemon failed to execute {uri}: {result['error']}")
+
+        return result
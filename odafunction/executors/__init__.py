@@ -1,15 +1,27 @@
+import atexit
+import contextlib
 import hashlib
 import rdflib
 import inspect
 import json
 import logging
 import os
+import contextvars
 import pathlib
+import re
+import threading
+import time
 import traceback
+import weakref
 
-from .. import LocalValue, LocalPythonFunction, Function, Executor
-from ..func.urifunc import URIPythonFunction, URIValue, URIFunction
+from .. import LocalValue, LocalPythonFunction, Function, Executor, partial_application
+from ..arghash import argument_digest
+from ..func.urifunc import URIPythonFunction, URIValue, URIFunction, StreamedValue, function_revisions, current_content_revision
 from ..utils import iterate_subclasses, repr_trim
+from ..compression import open_maybe_compressed, write_maybe_compressed
+from ..context import current_execution_context, execution_context
+from .memo import memo_store
+from .cachetiers import CacheTier, odaf_ontology, record_dependencies, recorded_revisions, portable_key, local_key, local_urivalue_prefix
 
 
 logger = logging.getLogger(__name__)
@@ -24,9 +36,28 @@ class LocalExecutor(Executor):
         if func.signature != inspect.Signature():
             raise RuntimeError(f"found non-0 signature: {func.signature}, please reduced function arguments before passing it to executors")
         
-        logger.info("executor: %s running func: %s", self, func)
-        v = func.local_python_function()
-        logger.info("found value %s", repr_trim(v))
+        memo_key = memo_store.key(func)
+        found = False
+
+        if memo_key is not None:
+            found, v = memo_store.get(memo_key, func)
+
+        if found:
+            logger.info("executor: %s found memoized value for func: %s", self, func)
+        else:
+            logger.info("executor: %s running func: %s", self, func)
+            profile = current_execution_context().profile
+
+            if profile:
+                from .profiling import profile_execution
+                v = profile_execution(func, memory=profile == "memory")
+            else:
+                v = func.local_python_function()
+
+            logger.info("found value %s", repr_trim(v))
+
+            if memo_key is not None and not inspect.isgenerator(v):
+                memo_store.put(memo_key, func, v)
         ex = Executor()
         
         r = self.output_value_class(value=v, provenance=ex(func, type).provenance)
@@ -41,16 +72,35 @@ class LocalURICachingExecutor(LocalExecutor):
 
     # executor only stores equivalences, not values
 
+    # new entries may be saved in batches: after flush_every changes, or flush_interval seconds after the first unsaved one.
+    # by default every change is saved at once. flush() and end of transaction() save durably, i.e. synced to disk
+    flush_every = 1
+    flush_interval = None
+
     @property
     def uri(self):
         return rdflib.URIRef(f"https://odahub.io/ontology#{self.__class__.__name__}")
 
-    def __init__(self, memory_graph_path=None) -> None:
+    def __init__(self, memory_graph_path=None, tiers=None) -> None:
         super().__init__()
 
         if memory_graph_path is not None:
             self.memory_graph_path = memory_graph_path
 
+        # local memory graph comes first, then the shared tiers, in order
+        if tiers is None:
+            self.tiers = CacheTier.from_env()
+        else:
+            self.tiers = [CacheTier.from_spec(t) if isinstance(t, str) else t for t in tiers]
+
+        # one executor may serve several threads: memory graph is only changed under the lock, functions run outside
+        self._lock = threading.RLock()
+
+        self._n_unsaved = 0
+        self._pending_publish = []
+        self._transaction_depth = 0
+        self._flush_timer = None
+
         self.load_cache()
 
     
@@ -71,7 +121,8 @@ class LocalURICachingExecutor(LocalExecutor):
 
         if self.memory_graph_path.exists():
             try:
-                self.memory_graph.parse(open(str(self.memory_graph_path)), format="turtle")
+                with open_maybe_compressed(self.memory_graph_path, "rb") as f:
+                    self.memory_graph.parse(f, format="turtle")
             except Exception as e:
                 logger.error("failed to load cache from %s", self.memory_graph_path)
                 traceback.print_exc()
@@ -82,35 +133,475 @@ class LocalURICachingExecutor(LocalExecutor):
             logger.info("initialized empty cache")
 
 
-    def save_cache(self):
-        self.memory_graph.serialize(open(str(self.memory_graph_path), "wb"), format="turtle")
+    def save_cache(self, durable=False):
+        with self._lock:
+            tmp_path = self.memory_graph_path.with_name(f".{self.memory_graph_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            write_maybe_compressed(tmp_path, self.memory_graph.serialize(format="turtle"))
+
+            if durable:
+                fsync_path(tmp_path)
+
+            os.replace(tmp_path, self.memory_graph_path)
+
+            if durable:
+                fsync_path(self.memory_graph_path.parent)
+
+            self._n_unsaved = 0
+
         logger.info("stored cache to %s", self.memory_graph_path)
 
+
+    def changed(self):
+        """
+        note a change of the memory graph, and save it if due. call without holding the lock: saving may publish to tiers
+        """
+        with self._lock:
+            self._n_unsaved += 1
+
+            if self._transaction_depth > 0:
+                return
+
+            due = self._n_unsaved >= self.flush_every
+
+            if not due:
+                _unflushed_executors.add(self)
+
+                if self.flush_interval is not None and self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+
+        if due:
+            self.flush(durable=False)
+
+
+    def flush(self, durable=True):
+        """
+        save unsaved entries, and publish them to writable tiers
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+            pending_publish, self._pending_publish = self._pending_publish, []
+
+            _unflushed_executors.discard(self)
+
+            if self._n_unsaved > 0:
+                n = self._n_unsaved
+                self.save_cache(durable=durable)
+                logger.info("flushed %s changes of cache, durable: %s", n, durable)
+
+        # values are loaded from local storage only now, and written to tiers without holding the lock
+        def entries():
+            for key, value_uri, revisions in pending_publish:
+                yield key, URIValue(uri=value_uri).value, revisions
+
+        for tier in self.tiers:
+            if tier.writable and len(pending_publish) > 0:
+                tier.publish(entries())
+
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        within this block, new entries are saved together at the end, in one durable write
+        """
+        with self._lock:
+            self._transaction_depth += 1
+
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._transaction_depth -= 1
+                due = self._transaction_depth == 0 and (self._n_unsaved > 0 or len(self._pending_publish) > 0)
+
+            if due:
+                self.flush()
+
     
+    def record_dependencies(self, value_uri, revisions):
+        record_dependencies(self.memory_graph, value_uri, revisions)
+
+
+    def recorded_revisions(self, value_uri):
+        return recorded_revisions(self.memory_graph, value_uri)
+
+
+    def forget(self, func_uri, keep_digests=False):
+        """
+        keep_digests: value may still be found by digest of its inputs, for early cutoff
+        """
+        for value_uri in list(self.memory_graph.objects(func_uri, self.uri)):
+            self.memory_graph.remove((func_uri, self.uri, value_uri))
+
+            for rev in list(self.memory_graph.objects(value_uri, odaf_ontology.dependsOn)):
+                self.memory_graph.remove((value_uri, odaf_ontology.dependsOn, rev))
+
+                if (None, odaf_ontology.dependsOn, rev) not in self.memory_graph:
+                    self.memory_graph.remove((rev, None, None))
+
+            if not keep_digests and (None, self.uri, value_uri) not in self.memory_graph:
+                self.memory_graph.remove((value_uri, odaf_ontology.contentDigest, None))
+                self.memory_graph.remove((value_uri, odaf_ontology.inputDigest, None))
+
+        logger.info("forgot cached results of %s", func_uri)
+
+
+    def invalidate_revisions(self, revs):
+        func_uris = set()
+
+        for rev in revs:
+            for value_uri in self.memory_graph.subjects(odaf_ontology.dependsOn, rev):
+                func_uris.update(self.memory_graph.subjects(self.uri, value_uri))
+
+        for func_uri in func_uris:
+            self.forget(func_uri)
+
+        if len(func_uris) > 0:
+            self.save_cache()
+
+        return len(func_uris)
+
+
+    def invalidate(self, function_uri):
+        """
+        forget only results which were computed using any revision of this function
+        """
+        revs = list(self.memory_graph.subjects(odaf_ontology.revisionOf, rdflib.URIRef(function_uri)))
+        n = self.invalidate_revisions(revs)
+        logger.info("invalidated %s cached results depending on %s", n, function_uri)
+        return n
+
+
+    def invalidate_stale(self):
+        """
+        forget results computed with revisions of local function sources which since changed
+        """
+        stale_revs = []
+
+        for rev, function_uri in self.memory_graph.subject_objects(odaf_ontology.revisionOf):
+            current = current_content_revision(function_uri)
+
+            if current is not None and current != str(self.memory_graph.value(rev, odaf_ontology.contentHash)):
+                logger.info("function %s changed, now %s", function_uri, current)
+                stale_revs.append(rev)
+
+        n = self.invalidate_revisions(stale_revs)
+        logger.info("invalidated %s stale cached results", n)
+        return n
+
+
+    def promote(self, func_uri, value, revisions):
+        """
+        store value found in a shared tier in the local tier
+        """
+        func_uri = rdflib.URIRef(func_uri)
+        value_uri = rdflib.URIRef(f"{local_urivalue_prefix()}promoted/{hashlib.sha256(str(func_uri).encode()).hexdigest()}")
+        r = URIValue(uri=value_uri, value=value)
+
+        with self._lock:
+            self.forget(func_uri)
+            self.memory_graph.add((rdflib.URIRef(func_uri), self.uri, r.uri))
+            self.record_dependencies(r.uri, revisions)
+
+        return r
+
+
+    def import_tier(self, tier):
+        """
+        promote all entries of a tier to local cache
+        """
+        n = 0
+        for key in tier.keys():
+            found, value = tier.lookup(key)
+            if found:
+                self.promote(local_key(key), value, tier.entry_revisions(key))
+                n += 1
+
+        self.save_cache()
+        logger.info("imported %s entries from %s", n, tier)
+        return n
+
+
+    def export_tier(self, tier, match=None):
+        """
+        publish local cache entries, with function URI matching regex, to a tier
+        """
+        def entries():
+            for func_uri, value_uri in self.memory_graph.subject_objects(self.uri):
+                if match is not None and re.search(match, str(func_uri)) is None:
+                    continue
+
+                value = URIValue(uri=value_uri).value
+
+                yield portable_key(func_uri), value, self.recorded_revisions(value_uri)
+
+        return tier.publish(entries())
+
+
+    def lookup(self, func):
+        """
+        URI of valid cached value for the function in local memory, or None
+        """
+        return self.lookup_many([func])[func.uri]
+
+
+    def lookup_many(self, funcs):
+        """
+        URIs of valid cached values in local memory by function URI, None if there is none; all looked up at once
+        """
+        revisions = {func.uri: function_revisions(func) for func in funcs}
+        func_uris = {rdflib.URIRef(str(func_uri)): func_uri for func_uri in revisions}
+
+        if len(func_uris) == 0:
+            return {}
+
+        # one query for values of all functions and revisions they were computed with
+        query = f"""
+            SELECT ?func ?value ?function ?hash WHERE {{
+                VALUES ?func {{ {" ".join(u.n3() for u in func_uris)} }}
+                ?func {self.uri.n3()} ?value .
+                OPTIONAL {{
+                    ?value odaf:dependsOn ?rev .
+                    ?rev odaf:revisionOf ?function ;
+                         odaf:contentHash ?hash .
+                }}
+            }}
+        """
+
+        with self._lock:
+            rows = list(self.memory_graph.query(query, initNs={'odaf': odaf_ontology}))
+
+        values = {}
+        for func, value, function, content_hash in rows:
+            value_revisions = values.setdefault(func, {}).setdefault(value, {})
+
+            if function is not None:
+                value_revisions[str(function)] = str(content_hash)
+
+        found = {}
+        for func, func_uri in func_uris.items():
+            func_values = values.get(func, {})
+
+            if len(func_values) == 1 and list(func_values.values())[0] == revisions[func_uri]:
+                found[func_uri] = list(func_values)[0]
+            else:
+                found[func_uri] = None
+
+        logger.info("looked up %s functions, found %s", len(found), sum(v is not None for v in found.values()))
+        return found
+
+
+    def lookup_tiers(self, func, revisions=None):
+        """
+        value of the function found in shared tiers, promoted to local cache; or None
+        """
+        if revisions is None:
+            revisions = function_revisions(func)
+
+        # tiers may be on slow shared storage: looked up, and value written locally, without holding the lock
+        for tier in self.tiers:
+            found, value = tier.lookup(portable_key(func.uri), revisions)
+
+            if found:
+                r = self.promote(func.uri, value, revisions)
+                logger.info("loaded from cache tier %s %s", tier, r)
+                self.changed()
+                return r
+
+        return None
+
+
     def __call__(self, func: URIPythonFunction) -> URIValue:
         
-        objects = list(self.memory_graph.objects(func.uri, self.uri))
+        revisions = function_revisions(func)
+
+        with self._lock:
+            objects = list(self.memory_graph.objects(func.uri, self.uri))
+            valid = len(objects) == 1 and self.recorded_revisions(objects[0]) == revisions
+
+            if valid:
+                logger.info("memory has entry %s %s %s", func.uri, self.uri, objects[0])
+            elif len(objects) > 0:
+                logger.info("cache entry for %s is stale: recorded revisions %s, current %s", func.uri, self.recorded_revisions(objects[0]), revisions)
+                self.forget(func.uri, keep_digests=True)
+            else:
+                logger.info("can not load from cache %s %s ?", func.uri, self.uri)            
 
-        if len(objects) == 1:
-            logger.info("memory has entry %s %s %s", func.uri, self.uri, objects[0])
+        if valid:
             r = URIValue(uri=objects[0])
             logger.info("loaded from cache %s", r)
-            
-        elif len(objects) == 0:        
-            logger.info("can not load from cache %s %s ?", func.uri, self.uri)            
+            return r
+
+        r = self.lookup_tiers(func, revisions)
+
+        if r is not None:
+            return r
+
+        pa = partial_application(func)
+
+        if pa is not None and any(isinstance(a, Function) for a in list(pa[1]) + list(pa[2].values())):
+            return self.call_with_early_cutoff(func, revisions)
+
+        logger.info("will run %s", func)
+        lv = super().__call__(func)
+
+        return self.store(func, lv.value, lv.provenance, revisions)
+
+
+    def input_digest(self, base, arg_digests, kwarg_digests):
+        """
+        digest of function and of content digests of its argument values, or None if some can not be hashed
+        """
+        if None in arg_digests or None in kwarg_digests.values():
+            return None
+
+        return argument_digest([str(getattr(base, 'uri', None)), getattr(base, 'content_revision', None), arg_digests, kwarg_digests], "sha256")
+
+
+    def content_digest(self, value_uri, value):
+        """
+        digest of the stored value, as recorded when it was stored, or computed now
+        """
+        with self._lock:
+            digest = self.memory_graph.value(rdflib.URIRef(value_uri), odaf_ontology.contentDigest)
+
+        if digest is not None:
+            return str(digest)
+
+        return content_digest(value)
+
+
+    def evaluate_input(self, a):
+        """
+        value of an argument, and digest of its content. functions with URI are executed by this executor, so that their values are cached
+        with digests, and these are not computed again
+        """
+        if isinstance(a, URIPythonFunction) and a.signature == inspect.Signature():
+            r = self(a)
+            return r.value, self.content_digest(r.uri, r.value)
 
-            logger.info("will run %s", func)
-            lv = super().__call__(func)
-            r = URIValue(value=lv.value, provenance=lv.provenance)
+        value = default_execute_to_value(a)
+        return value, content_digest(value)
 
+
+    def call_with_early_cutoff(self, func, revisions):
+        """
+        function with nested functions in arguments: arguments are evaluated first. if a value was computed before from arguments
+        with the same content digests, it is reused, even if the functions which computed the arguments changed since
+        """
+        base, args, kwargs = partial_application(func)
+
+        inputs = map_in_context_pool(self.evaluate_input, list(args) + list(kwargs.values()))
+        values = [value for value, _ in inputs]
+        digests = [digest for _, digest in inputs]
+
+        args, kwargs = values[:len(args)], dict(zip(kwargs, values[len(args):]))
+        digest = self.input_digest(base, digests[:len(args)], dict(zip(kwargs, digests[len(args):])))
+
+        if digest is not None:
+            with self._lock:
+                candidates = list(self.memory_graph.subjects(odaf_ontology.inputDigest, rdflib.Literal(digest)))
+
+            for value_uri in candidates:
+                # loaded outside of the lock, other threads go on meanwhile
+                try:
+                    r = URIValue(uri=value_uri)
+                except Exception as e:
+                    logger.warning("value %s with matching inputs can not be loaded: %s", value_uri, repr(e))
+                    continue
+
+                with self._lock:
+                    if (value_uri, odaf_ontology.inputDigest, rdflib.Literal(digest)) not in self.memory_graph:
+                        continue
+
+                    logger.info("early cutoff: inputs of %s are unchanged, reusing %s", func.uri, value_uri)
+                    self.forget(func.uri, keep_digests=True)
+
+                    relinked = not set(self.memory_graph.subjects(self.uri, value_uri)) - {func.uri}
+
+                    if relinked:
+                        self.memory_graph.add((func.uri, self.uri, value_uri))
+                        self.record_dependencies(value_uri, revisions)
+
+                if relinked:
+                    self.changed()
+                    return r
+
+                # value is recorded with revisions of one function, results of others get own copy
+                return self.store(func, r.value, Executor()(func, type).provenance, revisions, input_digest=digest)
+
+        logger.info("will run %s with evaluated arguments", func)
+        lv = super().__call__(LocalPythonFunction.__call__(base, *args, **kwargs))
+
+        return self.store(func, lv.value, Executor()(func, type).provenance, revisions, input_digest=digest)
+
+
+    def store(self, func, value, provenance, revisions=None, input_digest=None):
+        """
+        store value computed elsewhere as result of the function, in local memory and in writable tiers
+        """
+        if revisions is None:
+            revisions = function_revisions(func)
+
+        r = URIValue(value=value, provenance=provenance)
+
+        # streamed values are not hashed: generator is consumed, and stream may be large
+        value_digest = content_digest(r.value)
+
+        with self._lock:
             self.memory_graph.add((func.uri, self.uri, r.uri))
+            self.record_dependencies(r.uri, revisions)
 
-            self.save_cache()
-            
+            if value_digest is not None:
+                self.memory_graph.set((r.uri, odaf_ontology.contentDigest, rdflib.Literal(value_digest)))
+
+            if input_digest is not None:
+                self.memory_graph.set((r.uri, odaf_ontology.inputDigest, rdflib.Literal(input_digest)))
+
+            if any(tier.writable for tier in self.tiers):
+                # only location is kept until flush, value is loaded again when published
+                self._pending_publish.append((portable_key(func.uri), r.uri, revisions))
+
+        self.changed()
         
         return r
 
 
+def content_digest(value):
+    """
+    digest of value content, None if it can not be hashed, e.g. streamed values
+    """
+    try:
+        return argument_digest(value, "sha256")
+    except (TypeError, ValueError):
+        return None
+
+
+# executors with changes not saved yet are flushed when the process exits
+_unflushed_executors = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    for executor in list(_unflushed_executors):
+        try:
+            executor.flush()
+        except Exception as e:
+            logger.error("unable to flush cache of %s at exit: %s", executor, repr(e))
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
 class LocalURIExecutor(LocalExecutor):
     output_value_class=URIValue
 
@@ -135,7 +626,9 @@ class AnyExecutor(Executor):
                 spec = inspect.getfullargspec(cls.__call__)
                 logging.info("for func %s result_type %s executor %s spec %s", func, result_type, cls, spec)
 
-                if not isinstance(func, spec.annotations['func']):
+                if not getattr(cls, 'auto_selectable', True):
+                    logging.info("executor %s is not selected automatically", cls)
+                elif not isinstance(func, spec.annotations['func']):
                     logging.info("executor %s does not fit: func: %s but executor annotation is %s", cls, func, spec.annotations['func'])
                 elif not issubclass(spec.annotations.get('return'), result_type):
                     logging.info("executor %s does not fit: func result type %s but executor annotation %s", cls, result_type, spec.annotations.get('return'))
@@ -156,25 +649,113 @@ class AnyExecutor(Executor):
 # TODO move somewhere
 default_execute_to_value_cached = False
 
-def default_execute_to_value(f, cached=None, valueclass: type=LocalValue):
+# ExecutionPlanner, if set, decides how to execute instead of picking first fitting executor
+default_execute_to_value_planner = None
+
+def default_execute_to_value(f, cached=None, valueclass: type=None, planner=None):
     # only transform nullary function to local value
+    # options not set here are taken from the execution context of the outer call, if any
+
+    context = current_execution_context()
+
+    inherited_cached = cached is None and context.cached is not None
 
     if cached is None:
-        cached = default_execute_to_value_cached
-    
+        cached = context.cached if context.cached is not None else default_execute_to_value_cached
+
+    if valueclass is None:
+        valueclass = context.valueclass if context.valueclass is not None else LocalValue
+
+    if planner is None:
+        planner = context.planner if context.planner is not None else default_execute_to_value_planner
+
+    if not isinstance(f, Function):
+        return f
+
+    # policy passed to nested evaluation, even if this function itself can not be cached
+    cached_policy = cached
+
+    if cached and inherited_cached and not isinstance(f, URIFunction):
+        logger.info("nested function %s has no URI and is not cached", f)
+        cached = False
+
     if cached:
         f.cached = True
         selector = lambda ex: getattr(ex, 'caching', False )
     else:
         selector = lambda ex: True
 
-    if isinstance(f, Function):
-        logger.info("default_execute: %s", f)
-        if f.signature == inspect.Signature():
-            logger.info("nullary: default_execute proceeds to AnyExecutor")
-            return AnyExecutor(executor_selector=selector)(f, valueclass).value
+    if context.executor_selector is not None:
+        selector = lambda ex, selector=selector: selector(ex) and context.executor_selector(ex)
+
+    logger.info("default_execute: %s", f)
+    if f.signature != inspect.Signature():
+        logger.info("NOT nullary returning")
+        return f
+
+    with execution_context(cached=cached_policy, valueclass=valueclass, planner=planner, depth=context.depth + 1) as nested_context:
+        t0 = time.time()
+
+        if planner is not None:
+            logger.info("nullary: default_execute proceeds to planner")
+            r = planner.execute(f, cached=cached, valueclass=valueclass)
         else:
-            logger.info("NOT nullary returning")
-            return f
+            logger.info("nullary: default_execute proceeds to AnyExecutor")
+            r = AnyExecutor(executor_selector=selector)(f, valueclass)
+
+        if nested_context.trace is not None:
+            nested_context.trace.append({
+                'function': repr_trim(f, 200),
+                'depth': context.depth,
+                'cached': cached,
+                'valueclass': valueclass.__name__,
+                'duration': time.time() - t0,
+            })
+
+    return r.value
+
+
+def map_in_context_pool(evaluate, funcs, **options):
+    """
+    evaluate(f, **options) for each of funcs, in parallel if execution context has a pool and there are several functions
+    """
+    pool = current_execution_context().pool
+
+    if pool is None or sum(isinstance(f, Function) for f in funcs) < 2:
+        return [evaluate(f, **options) for f in funcs]
+
+    # arguments of arguments are evaluated serially within pool workers, waiting on own pool could deadlock
+    def submit(f):
+        with execution_context(pool=None):
+            ctx = contextvars.copy_context()
+
+        return pool.submit(ctx.run, evaluate, f, **options)
+
+    futures = [submit(f) for f in funcs]
+
+    return [fu.result() for fu in futures]
+
+
+def evaluate_values(funcs, **options):
+    """
+    values of nullary functions, other values as they are; in parallel if execution context has a pool.
+    options are passed to default_execute_to_value
+    """
+    return map_in_context_pool(default_execute_to_value, funcs, **options)
+
+
+def evaluate_arguments(args, kwargs):
+    """
+    execute nullary functions among the arguments; in parallel if execution context has a pool
+    """
+    from .fusion import fusion_key, execute_fused
+
+    # several calls of a function with batched implementation are fused in one call
+    keys = [fusion_key(a) for a in list(args) + list(kwargs.values())]
+
+    if any(k is not None and keys.count(k) > 1 for k in keys):
+        values = execute_fused(list(args) + list(kwargs.values()))
     else:
-        return f
\ No newline at end of file
+        values = evaluate_values(list(args) + list(kwargs.values()))
+
+    return values[:len(args)], dict(zip(kwargs, values[len(args):]))
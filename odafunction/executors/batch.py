@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ..context import execution_context
+from ..func.urifunc import URIFunction, StreamedValue, current_content_revision
+from . import LocalExecutor, LocalURIExecutor, LocalURICachingExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+def result_json_default(o):
+    if isinstance(o, StreamedValue):
+        return list(o)
+
+    return repr(o)
+
+
+class BatchRunner:
+    """
+    executes many requests {"uri": ..., "args": [...], "kwargs": {...}, "id": ...} in a thread pool, yielding results as they complete
+
+    functions are loaded once per URI, and one caching executor is shared by all requests
+    """
+
+    flush_every = 100
+    flush_interval = 1.
+
+    def __init__(self, parallel=4, cached=True, urivalue=False, caching_executor=None) -> None:
+        self.parallel = parallel
+        self.cached = cached
+        self.urivalue = urivalue
+
+        if cached and caching_executor is None:
+            caching_executor = self.new_caching_executor()
+
+        self.caching_executor = caching_executor
+
+        # uri: (function, content revision of the source when loaded)
+        self._functions = {}
+        self._functions_lock = threading.Lock()
+        self._load_locks = {}
+
+    def new_caching_executor(self):
+        # many results come at once: cache is written in batches, not after each of them
+        caching_executor = LocalURICachingExecutor()
+        caching_executor.flush_every = self.flush_every
+        caching_executor.flush_interval = self.flush_interval
+        return caching_executor
+
+    def function(self, uri):
+        """
+        loaded function, loaded again if its local source changed since
+        """
+        revision = current_content_revision(uri)
+
+        with self._functions_lock:
+            loaded = self._functions.get(uri)
+
+            if loaded is not None and loaded[1] == revision:
+                return loaded[0]
+
+            lock = self._load_locks.setdefault(uri, threading.Lock())
+
+        # loading may download or parse a notebook: only requests for the same function wait for it
+        with lock:
+            with self._functions_lock:
+                loaded = self._functions.get(uri)
+
+            if loaded is not None and loaded[1] == revision:
+                return loaded[0]
+
+            if loaded is not None:
+                logger.info("source of %s changed: %s => %s, reloading", uri, loaded[1], revision)
+
+            func = URIFunction.from_uri(uri)
+
+            with self._functions_lock:
+                self._functions[uri] = (func, revision)
+
+            return func
+
+    def forget_functions(self):
+        with self._functions_lock:
+            self._functions.clear()
+
+    @property
+    def loaded_functions(self):
+        with self._functions_lock:
+            return {uri: revision for uri, (_, revision) in self._functions.items()}
+
+    def execute(self, request):
+        """
+        request may override cached and urivalue of the runner
+        """
+        t0 = time.time()
+        result = {'id': request.get('id'), 'uri': request.get('uri')}
+
+        cached = request.get('cached', self.cached)
+        urivalue = request.get('urivalue', self.urivalue)
+
+        try:
+            f = self.function(request['uri'])(*request.get('args', []), **request.get('kwargs', {}))
+
+            with execution_context(cached=cached):
+                if cached:
+                    with self._functions_lock:
+                        if self.caching_executor is None:
+                            self.caching_executor = self.new_caching_executor()
+
+                    r = self.caching_executor(f)
+                elif urivalue:
+                    r = LocalURIExecutor()(f)
+                else:
+                    r = LocalExecutor()(f)
+
+            if urivalue:
+                result['value_uri'] = str(r.uri)
+            else:
+                result['value'] = r.value
+        except Exception as e:
+            logger.error("request %s failed: %s", request, repr(e))
+            result['error'] = repr(e)
+            result['traceback'] = traceback.format_exc()
+
+        result['duration'] = time.time() - t0
+        return result
+
+    def run(self, requests):
+        """
+        yields results in order of completion; at most 2 * parallel requests are read ahead
+        """
+        with ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="odaf-batch") as pool:
+            pending = set()
+
+            for i, request in enumerate(requests):
+                request.setdefault('id', i)
+                pending.add(pool.submit(self.execute, request))
+
+                if len(pending) >= 2 * self.parallel:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fu in done:
+                        yield fu.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fu in done:
+                    yield fu.result()
+
+        if self.caching_executor is not None:
+            self.caching_executor.flush()
@@ -0,0 +1,313 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import socket
+import time
+import uuid
+
+import rdflib
+
+from ..compression import open_maybe_compressed, write_maybe_compressed, open_for_writing
+from ..func.urifunc import StreamedValue
+
+
+logger = logging.getLogger(__name__)
+
+odaf_ontology = rdflib.Namespace("https://odahub.io/ontology#")
+
+
+# results depend on content revisions of the functions used to compute them:
+#   value odaf:dependsOn revision; revision odaf:revisionOf function; revision odaf:contentHash hash
+# and values are identified by content, and by content of the inputs they were computed from:
+#   value odaf:contentDigest digest; value odaf:inputDigest digest
+
+def revision_node(function_uri, content_hash):
+    return rdflib.URIRef(f"urn:odafunction:revision:{hashlib.sha256(f'{function_uri} {content_hash}'.encode()).hexdigest()[:16]}")
+
+
+def record_dependencies(graph, value_uri, revisions):
+    for function_uri, content_hash in revisions.items():
+        rev = revision_node(function_uri, content_hash)
+        graph.add((value_uri, odaf_ontology.dependsOn, rev))
+        graph.add((rev, odaf_ontology.revisionOf, rdflib.URIRef(function_uri)))
+        graph.add((rev, odaf_ontology.contentHash, rdflib.Literal(content_hash)))
+
+
+def recorded_revisions(graph, value_uri):
+    revisions = {}
+
+    for rev in graph.objects(value_uri, odaf_ontology.dependsOn):
+        for function_uri in graph.objects(rev, odaf_ontology.revisionOf):
+            revisions[str(function_uri)] = str(graph.value(rev, odaf_ontology.contentHash))
+
+    return revisions
+
+
+# function URIs derived from provenance start with local $HOME/urivalue, which differs between users and nodes
+
+def local_urivalue_prefix():
+    return f"file://{os.getenv('HOME')}/urivalue/"
+
+
+def portable_key(func_uri):
+    func_uri = str(func_uri)
+
+    if func_uri.startswith(local_urivalue_prefix()):
+        return "urivalue://" + func_uri[len(local_urivalue_prefix()):]
+
+    return func_uri
+
+
+def local_key(key):
+    key = str(key)
+
+    if key.startswith("urivalue://"):
+        return local_urivalue_prefix() + key[len("urivalue://"):]
+
+    return key
+
+
+class CacheTier:
+    """
+    cache directory, possibly shared between users and nodes: memory-graph.ttl maps portable function keys to value files in values/
+
+    publishers take turns by exclusive creation of memory-graph.ttl.lock, which works on NFS, unlike flock
+    """
+
+    lock_timeout = 60
+    # lock of a publisher which died is broken after this time
+    stale_lock_time = 300
+
+    def __init__(self, path, writable=False) -> None:
+        self.path = pathlib.Path(path)
+        self.writable = writable
+        self._graph = None
+        self._graph_stamp = None
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path} {'rw' if self.writable else 'ro'}]"
+
+    @classmethod
+    def from_spec(cls, spec):
+        # "/path/to/cache" is read-only, "/path/to/cache:rw" is writable
+        if spec.endswith(":rw"):
+            return cls(spec[:-3], writable=True)
+        elif spec.endswith(":ro"):
+            return cls(spec[:-3], writable=False)
+        else:
+            return cls(spec, writable=False)
+
+    @classmethod
+    def from_env(cls):
+        return [cls.from_spec(spec) for spec in os.getenv("ODAFUNCTION_CACHE_TIERS", "").split(",") if spec.strip() != ""]
+
+    @property
+    def graph_path(self):
+        return self.path / "memory-graph.ttl"
+
+    @property
+    def graph(self):
+        # other users may publish to the tier: reload when it changes
+        try:
+            st = os.stat(self.graph_path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+
+        graph = self._graph
+
+        if graph is None or stamp != self._graph_stamp:
+            # parsed aside: other threads keep using the previous graph meanwhile
+            graph = rdflib.Graph()
+
+            if stamp is not None:
+                with open_maybe_compressed(self.graph_path, "rb") as f:
+                    graph.parse(f, format="turtle")
+
+            self._graph, self._graph_stamp = graph, stamp
+            logger.info("loaded cache tier %s; %s triples", self, len(graph))
+
+        return graph
+
+    def value_node(self, key):
+        return rdflib.URIRef(f"urn:odafunction:value:{hashlib.sha256(key.encode()).hexdigest()}")
+
+    def keys(self):
+        return [str(k) for k in self.graph.subjects(odaf_ontology.cachedValue, None)]
+
+    def lookup(self, key, revisions=None):
+        """
+        returns (found, value); if revisions are given, entries computed with other revisions are ignored
+        """
+        graph = self.graph
+        value_node = graph.value(rdflib.URIRef(key), odaf_ontology.cachedValue)
+
+        if value_node is None:
+            return False, None
+
+        if revisions is not None and recorded_revisions(graph, value_node) != revisions:
+            logger.info("cache tier %s has %s at other revisions", self, key)
+            return False, None
+
+        stored_at = graph.value(value_node, odaf_ontology.storedAt)
+        stored_at_path = pathlib.PurePosixPath(str(stored_at))
+
+        # graph is written by others: values are only read from within the tier
+        if stored_at is None or stored_at_path.is_absolute() or ".." in stored_at_path.parts:
+            logger.warning("cache tier %s refers to %s outside of the tier, ignoring it", self, stored_at)
+            return False, None
+
+        try:
+            if StreamedValue.is_stream_file(self.path / stored_at_path):
+                value = StreamedValue(self.path / stored_at_path)
+            else:
+                with open_maybe_compressed(self.path / stored_at_path) as f:
+                    value = json.load(f)
+        except FileNotFoundError:
+            logger.warning("cache tier %s refers to missing %s", self, stored_at)
+            return False, None
+
+        logger.info("cache tier %s has %s", self, key)
+        return True, value
+
+    def entry_revisions(self, key):
+        return recorded_revisions(self.graph, self.value_node(key))
+
+    def publish(self, entries):
+        """
+        entries: iterable of (key, value, revisions)
+        """
+
+        if not self.writable:
+            raise RuntimeError(f"cache tier {self} is read-only")
+
+        os.makedirs(self.path / "values", exist_ok=True)
+
+        # values are written before taking the lock, each to own file
+        published = []
+        for key, value, revisions in entries:
+            value_node = self.value_node(key)
+            stored_at = f"values/{value_node.split(':')[-1]}.json"
+
+            if isinstance(value, StreamedValue):
+                self._write_stream_atomic(self.path / stored_at, value)
+            else:
+                self._write_atomic(self.path / stored_at, json.dumps(value))
+            published.append((key, value_node, stored_at, revisions))
+
+        with self.publish_lock():
+            # start from what is on disk now, others might have published meanwhile
+            self._graph = None
+            graph = self.graph
+
+            for key, value_node, stored_at, revisions in published:
+                graph.remove((rdflib.URIRef(key), odaf_ontology.cachedValue, None))
+                graph.remove((value_node, None, None))
+
+                graph.add((rdflib.URIRef(key), odaf_ontology.cachedValue, value_node))
+                graph.add((value_node, odaf_ontology.storedAt, rdflib.Literal(stored_at)))
+                record_dependencies(graph, value_node, revisions)
+
+            self._write_atomic(self.graph_path, graph.serialize(format="turtle"))
+            self._graph = None
+
+        n = len(published)
+
+        logger.info("published %s entries to %s", n, self)
+        return n
+
+    @property
+    def lock_path(self):
+        return self.path / "memory-graph.ttl.lock"
+
+    @contextlib.contextmanager
+    def publish_lock(self):
+        t0 = time.time()
+        owner = f"{socket.gethostname()} {os.getpid()} {uuid.uuid4().hex}"
+
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                self._break_stale_lock()
+
+                if time.time() - t0 > self.lock_timeout:
+                    raise RuntimeError(f"unable to lock cache tier {self} in {self.lock_timeout} s, held by {self._lock_owner()}")
+
+                time.sleep(0.05)
+                continue
+
+            with os.fdopen(fd, "w") as f:
+                f.write(owner)
+
+            break
+
+        try:
+            yield
+        finally:
+            if self._lock_owner() == owner:
+                os.remove(self.lock_path)
+            else:
+                logger.warning("lock of cache tier %s was broken by another publisher", self)
+
+    def _lock_owner(self, path=None):
+        try:
+            with open(path or self.lock_path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _break_stale_lock(self):
+        try:
+            age = time.time() - os.stat(self.lock_path).st_mtime
+        except FileNotFoundError:
+            return
+
+        if age > self.stale_lock_time:
+            stale_owner = self._lock_owner()
+
+            # rename is atomic: only one of the waiting publishers moves the lock away
+            stale_path = self.lock_path.with_name(f".{self.lock_path.name}.{uuid.uuid4().hex}.stale")
+
+            try:
+                os.rename(self.lock_path, stale_path)
+            except FileNotFoundError:
+                return
+
+            if stale_owner is None or self._lock_owner(stale_path) != stale_owner:
+                # stale lock was released and another publisher took a fresh one meanwhile: it is put back.
+                # link does not replace, if yet another publisher locked since, it is too late
+                logger.warning("lock of cache tier %s was taken again while breaking it, putting it back", self)
+
+                try:
+                    os.link(stale_path, self.lock_path)
+                except FileExistsError:
+                    logger.error("unable to put back lock of cache tier %s, taken by %s", self, self._lock_owner())
+
+                os.remove(stale_path)
+                return
+
+            logger.warning("breaking lock of cache tier %s held for %.3g s by %s", self, age, stale_owner)
+            os.remove(stale_path)
+
+    def _write_atomic(self, path, text):
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+
+        write_maybe_compressed(tmp_path, text)
+
+        os.replace(tmp_path, path)
+
+    def _write_stream_atomic(self, path, stream: StreamedValue):
+        # copied item by item, in the same format, never as a whole
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+
+        with open_for_writing(tmp_path) as f:
+            f.write(StreamedValue.header + "\n")
+
+            for item in stream:
+                f.write(json.dumps(item) + "\n")
+
+        os.replace(tmp_path, path)
@@ -0,0 +1,159 @@
+import contextlib
+import inspect
+import logging
+
+from .. import Function, LocalPythonFunction, LocalValue, Executor, partial_application
+from ..context import current_execution_context
+from ..func.urifunc import URIFunction, URIValue
+from . import LocalURICachingExecutor, default_execute_to_value, evaluate_arguments, evaluate_values
+
+
+logger = logging.getLogger(__name__)
+
+# many calls of the same function, each partially applied to own arguments, may be executed in one call of its batched implementation.
+# batched implementation takes the same parameters, each as list of values of all calls, and returns list of results, one per call
+
+
+def batched_implementation(base):
+    if not isinstance(base, LocalPythonFunction):
+        return None
+
+    if base.batched is not None:
+        return base.batched
+
+    return getattr(base.local_python_function, 'batched', None)
+
+
+def fusion_key(func):
+    """
+    key shared by calls which can be fused, or None
+    """
+    if not isinstance(func, Function) or func.signature != inspect.Signature():
+        return None
+
+    pa = partial_application(func)
+
+    if pa is None or batched_implementation(pa[0]) is None:
+        return None
+
+    return id(pa[0].local_python_function)
+
+
+def call_batched(funcs):
+    """
+    evaluate calls of the same base function with one call of its batched implementation; returns list of values
+    """
+    base = partial_application(funcs[0])[0]
+    signature = inspect.signature(base.local_python_function)
+
+    columns = {name: [] for name in signature.parameters}
+
+    for func in funcs:
+        _, args, kwargs = partial_application(func)
+        args, kwargs = evaluate_arguments(args, kwargs)
+
+        ba = signature.bind(*args, **kwargs)
+        ba.apply_defaults()
+
+        for name, value in ba.arguments.items():
+            columns[name].append(value)
+
+    logger.info("fused %s calls of %s in one batched call", len(funcs), base)
+    values = list(batched_implementation(base)(**columns))
+
+    if len(values) != len(funcs):
+        raise RuntimeError(f"batched implementation of {base} returned {len(values)} results for {len(funcs)} calls")
+
+    return values
+
+
+def execute_fused(funcs, cached=None, valueclass: type=None, caching_executor=None):
+    """
+    like default_execute_to_value for each function, but calls which can be fused are executed together.
+
+    each result still gets own provenance, and, if cached, own cache entry; cached results are not recomputed
+    """
+    context = current_execution_context()
+
+    # functions which are not fused get the options as given: policy inherited from context does not apply to functions without URI
+    cache_policy = cached if cached is not None else context.cached
+
+    if valueclass is None:
+        valueclass = context.valueclass if context.valueclass is not None else LocalValue
+
+    values = [None] * len(funcs)
+    groups = {}
+    unfused = []
+
+    for i, func in enumerate(funcs):
+        key = fusion_key(func)
+
+        if key is None:
+            unfused.append(i)
+        else:
+            groups.setdefault(key, []).append(i)
+
+    for i, value in zip(unfused, evaluate_values([funcs[i] for i in unfused], cached=cached, valueclass=valueclass)):
+        values[i] = value
+
+    for indices in groups.values():
+        if cache_policy and caching_executor is None and any(isinstance(funcs[i], URIFunction) for i in indices):
+            caching_executor = LocalURICachingExecutor()
+
+        missing = []
+
+        # only functions with URI are cached, and there may be none in the group
+        uri_funcs = [funcs[i] for i in indices if isinstance(funcs[i], URIFunction)] if cache_policy else []
+
+        if len(uri_funcs) > 0:
+            found = caching_executor.lookup_many(uri_funcs)
+        else:
+            found = {}
+
+        for i in indices:
+            func = funcs[i]
+            value_uri = found.get(func.uri) if isinstance(func, URIFunction) else None
+
+            if value_uri is not None:
+                logger.info("found cached value for %s", func)
+                values[i] = URIValue(uri=value_uri).value
+            else:
+                missing.append(i)
+
+        # not in local memory, but maybe in shared tiers, like for single calls; promoted entries are saved together
+        if len(uri_funcs) > 0 and len(caching_executor.tiers) > 0:
+            with caching_executor.transaction():
+                for i in list(missing):
+                    if not isinstance(funcs[i], URIFunction):
+                        continue
+
+                    r = caching_executor.lookup_tiers(funcs[i])
+
+                    if r is not None:
+                        values[i] = r.value
+                        missing.remove(i)
+
+        if len(missing) == 0:
+            continue
+
+        if len(missing) == 1:
+            i = missing[0]
+            values[i] = default_execute_to_value(funcs[i], cached=bool(cache_policy) and isinstance(funcs[i], URIFunction), valueclass=valueclass)
+            continue
+
+        batch_values = call_batched([funcs[i] for i in missing])
+
+        # all results of the batch are written to the cache at once
+        with caching_executor.transaction() if len(uri_funcs) > 0 else contextlib.nullcontext():
+            for i, value in zip(missing, batch_values):
+                func = funcs[i]
+                provenance = Executor()(func, type).provenance
+
+                if cache_policy and isinstance(func, URIFunction):
+                    r = caching_executor.store(func, value, provenance)
+                else:
+                    r = valueclass(value=value, provenance=provenance)
+
+                values[i] = r.value
+
+    return values
@@ -0,0 +1,155 @@
+import inspect
+import logging
+
+from .. import Function, LocalPythonFunction, partial_application
+from ..arghash import argument_digest
+from ..context import execution_context
+from ..func.urifunc import URIFunction
+from . import default_execute_to_value
+
+
+logger = logging.getLogger(__name__)
+
+# nested functions are normally evaluated by recursion through closures of LocalPythonFunction.
+# here the graph is built explicitly, identical nodes are merged, and nodes are evaluated in topological order without recursion
+
+
+def is_nullary(a):
+    if not isinstance(a, Function):
+        return False
+
+    try:
+        return a.signature == inspect.Signature()
+    except (NotImplementedError, TypeError):
+        return False
+
+
+class GraphEvaluator:
+    """
+    evaluates nullary function with nested function arguments iteratively, each distinct sub-function once
+
+    sub-functions are identical if they have the same URI, or the same base function applied to identical arguments
+    """
+
+    def __init__(self) -> None:
+        self.nodes = {}
+        self.values = {}
+        self.n_references = 0
+
+    @property
+    def n_executed(self):
+        return len(self.values)
+
+    def children(self, node):
+        pa = partial_application(node)
+
+        if pa is None:
+            return []
+
+        _, args, kwargs = pa
+        return [a for a in list(args) + list(kwargs.values()) if is_nullary(a)]
+
+    def base_key(self, base):
+        if isinstance(base, URIFunction):
+            return ('uri', str(base.uri))
+        elif isinstance(base, LocalPythonFunction):
+            return ('python', id(base.local_python_function))
+        else:
+            return ('object', id(base))
+
+    def argument_key(self, a, key_by_id):
+        if id(a) in key_by_id:
+            return key_by_id[id(a)]
+        elif isinstance(a, Function):
+            return ('object', id(a))
+
+        try:
+            return ('value', argument_digest(a, "sha256"))
+        except (TypeError, ValueError):
+            return ('object', id(a))
+
+    def node_key(self, node, key_by_id):
+        if isinstance(node, URIFunction):
+            return ('uri', str(node.uri))
+
+        pa = partial_application(node)
+
+        if pa is None:
+            return ('object', id(node))
+
+        base, args, kwargs = pa
+        return (
+            'partial',
+            self.base_key(base),
+            tuple(self.argument_key(a, key_by_id) for a in args),
+            tuple(sorted((k, self.argument_key(v, key_by_id)) for k, v in kwargs.items())),
+        )
+
+    def build(self, root):
+        """
+        returns node keys in topological order, and key of every function object in the graph
+        """
+        key_by_id = {}
+        order = []
+        stack = [(root, False)]
+
+        while stack:
+            node, expanded = stack.pop()
+
+            if id(node) in key_by_id:
+                self.n_references += 1
+                continue
+
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((c, False) for c in reversed(self.children(node)) if id(c) not in key_by_id)
+            else:
+                key = self.node_key(node, key_by_id)
+                key_by_id[id(node)] = key
+
+                if key in self.nodes:
+                    self.n_references += 1
+                else:
+                    self.nodes[key] = node
+                    order.append(key)
+
+        logger.info("built graph of %s distinct nodes", len(order))
+        return order, key_by_id
+
+    def evaluate_node(self, node, key_by_id):
+        pa = partial_application(node)
+
+        if pa is None or len(self.children(node)) == 0:
+            return default_execute_to_value(node)
+
+        base, args, kwargs = pa
+
+        def resolve(a):
+            if is_nullary(a):
+                return self.values[key_by_id[id(a)]]
+            return a
+
+        # same base function, applied to values of sub-functions instead of sub-functions themselves
+        f = base(*[resolve(a) for a in args], **{k: resolve(v) for k, v in kwargs.items()})
+        return default_execute_to_value(f)
+
+    def evaluate(self, root, **context_options):
+        """
+        context_options, e.g. cached=True, apply to each node
+        """
+        if not is_nullary(root):
+            return default_execute_to_value(root)
+
+        order, key_by_id = self.build(root)
+
+        with execution_context(**context_options):
+            for key in order:
+                if key not in self.values:
+                    self.values[key] = self.evaluate_node(self.nodes[key], key_by_id)
+
+        logger.info("evaluated %s nodes, reused %s references", self.n_executed, self.n_references)
+        return self.values[key_by_id[id(root)]]
+
+
+def evaluate_graph(f, **context_options):
+    return GraphEvaluator().evaluate(f, **context_options)
@@ -0,0 +1,166 @@
+import inspect
+import logging
+import math
+import multiprocessing
+import resource
+import signal
+import time
+import traceback
+
+from .. import LocalPythonFunction, LocalValue, Executor
+from ..utils import repr_trim
+from ..sharedvalues import SharedValueRef, is_shareable, share_value
+from . import LocalExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+class IsolatedExecutionError(RuntimeError):
+    """
+    isolated execution did not produce a value; report has reason, limits and measured resource usage
+    """
+
+    def __init__(self, message, report) -> None:
+        super().__init__(message, report)
+        self.report = report
+
+    @property
+    def reason(self):
+        return self.report['reason']
+
+
+def _virtual_memory_size():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def _run_limited(conn, func, memory_limit, cpu_limit):
+    # runs in forked child process
+    if memory_limit is not None:
+        limit = _virtual_memory_size() + memory_limit
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    if cpu_limit is not None:
+        resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(cpu_limit), math.ceil(cpu_limit) + 1))
+
+    try:
+        status, payload = 'ok', func.local_python_function()
+    except MemoryError:
+        status, payload = 'memory', None
+    except Exception as e:
+        status, payload = 'exception', {'error': repr(e), 'traceback': traceback.format_exc()}
+
+    # large arrays are passed to the parent by reference, not through the pipe. parent gets read-only view
+    if status == 'ok' and hasattr(payload, 'dtype') and is_shareable(payload):
+        payload = share_value(payload)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    usage = {'peak_memory': usage.ru_maxrss * 1024, 'cpu_time': usage.ru_utime + usage.ru_stime}
+
+    try:
+        conn.send((status, payload, usage))
+    except Exception as e:
+        conn.send(('exception', {'error': f"value can not be returned from isolated process: {e!r}", 'traceback': traceback.format_exc()}, usage))
+
+    conn.close()
+
+
+class IsolatedExecutor(LocalExecutor):
+    """
+    runs the function in a forked subprocess with wall-clock timeout, memory budget and CPU time limit
+
+    memory_limit: bytes the function may allocate beyond what the process had when forked
+    cpu_limit, timeout: seconds
+
+    resource usage of the last execution is in last_report, and in resource_usage of the returned value
+    """
+
+    # in-process execution stays the default, isolation is explicit
+    auto_selectable = False
+
+    def __init__(self, timeout=None, memory_limit=None, cpu_limit=None) -> None:
+        super().__init__()
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.last_report = None
+
+    @property
+    def limits(self):
+        return {'timeout': self.timeout, 'memory_limit': self.memory_limit, 'cpu_limit': self.cpu_limit}
+
+    def run_isolated(self, func):
+        ctx = multiprocessing.get_context("fork")
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+
+        t0 = time.time()
+        process = ctx.Process(target=_run_limited, args=(child_conn, func, self.memory_limit, self.cpu_limit), daemon=True)
+        process.start()
+        child_conn.close()
+
+        received = None
+        try:
+            if parent_conn.poll(self.timeout):
+                received = parent_conn.recv()
+        except EOFError:
+            pass
+
+        if received is None and process.is_alive():
+            process.terminate()
+            process.join(1)
+
+            if process.is_alive():
+                process.kill()
+
+        process.join()
+        wall_time = time.time() - t0
+
+        report = {'wall_time': wall_time, 'limits': self.limits, 'exitcode': process.exitcode}
+
+        if received is not None:
+            status, payload, usage = received
+            report.update(usage)
+
+            if isinstance(payload, SharedValueRef):
+                # view keeps the value, reference of the child is passed to the parent
+                report['shared'] = payload.path
+                ref, payload = payload, payload.attach()
+                ref.release()
+        elif wall_time >= (self.timeout or math.inf):
+            status, payload = 'timeout', None
+        elif process.exitcode == -signal.SIGXCPU:
+            status, payload = 'cpu', None
+        elif process.exitcode == -signal.SIGKILL and self.memory_limit is not None:
+            status, payload = 'memory', None
+        else:
+            status, payload = 'killed', None
+
+        report['reason'] = status
+        self.last_report = report
+
+        return status, payload, report
+
+    def __call__(self, func: LocalPythonFunction) -> LocalValue:
+        if func.signature != inspect.Signature():
+            raise RuntimeError(f"found non-0 signature: {func.signature}, please reduced function arguments before passing it to executors")
+
+        logger.info("executor: %s running isolated func: %s", self, func)
+        status, payload, report = self.run_isolated(func)
+        logger.info("isolated execution report: %s", report)
+
+        if status == 'exception':
+            report.update(payload)
+            raise IsolatedExecutionError(f"function failed in isolated process: {payload['error']}", report)
+        elif status == 'killed':
+            raise IsolatedExecutionError(f"isolated process was killed, exit code {report['exitcode']}", report)
+        elif status != 'ok':
+            raise IsolatedExecutionError(f"function exceeded {status} limit: {self.limits}", report)
+
+        logger.info("found value %s", repr_trim(payload))
+
+        r = self.output_value_class(value=payload, provenance=Executor()(func, type).provenance)
+        r.resource_usage = report
+
+        self.note_execution(func, r)
+        return r
@@ -0,0 +1,109 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from .. import Function, LocalPythonFunction, partial_application
+from ..arghash import argument_digest
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoStore:
+    """
+    in-process LRU store of results of local python functions which opted in with memoize=True
+
+    keyed by identity of the function and canonical hash of the bound arguments
+    """
+
+    def __init__(self, maxsize=1024) -> None:
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats_by_function = {}
+
+    def key(self, func: Function):
+        """
+        memo key, or None if the function did not opt in or its arguments can not be hashed
+        """
+        pa = partial_application(func)
+
+        if pa is None:
+            return None
+
+        base, args, kwargs = pa
+
+        if not isinstance(base, LocalPythonFunction) or not base.memoize:
+            return None
+
+        try:
+            args_hash = argument_digest([args, kwargs], "sha256")
+        except (TypeError, ValueError) as e:
+            logger.info("not memoizing %s: %s", func, e)
+            return None
+
+        return (id(base.local_python_function), args_hash)
+
+    def _stats(self, func: Function):
+        base = partial_application(func)[0]
+        name = getattr(base.local_python_function, '__qualname__', repr(base.local_python_function))
+        return self.stats_by_function.setdefault(name, {'hits': 0, 'misses': 0})
+
+    def get(self, key, func: Function):
+        """
+        returns (found, value)
+        """
+        base_function = partial_application(func)[0].local_python_function
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            # id of a function may be reused after it is gone, entry keeps the function to compare
+            if entry is not None and entry[0] is base_function:
+                self._entries.move_to_end(key)
+                self._stats(func)['hits'] += 1
+                return True, entry[1]
+
+            self._stats(func)['misses'] += 1
+            return False, None
+
+    def put(self, key, func: Function, value):
+        with self._lock:
+            self._entries[key] = (partial_application(func)[0].local_python_function, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats_by_function.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def report(self):
+        """
+        hits, misses and hit rate, in total and by function
+        """
+        by_function = {}
+
+        for name, stats in self.stats_by_function.items():
+            n = stats['hits'] + stats['misses']
+            by_function[name] = {**stats, 'hit_rate': stats['hits'] / n if n > 0 else None}
+
+        hits = sum(s['hits'] for s in self.stats_by_function.values())
+        misses = sum(s['misses'] for s in self.stats_by_function.values())
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses > 0 else None,
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'by_function': by_function,
+        }
+
+
+memo_store = MemoStore()
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import uuid
+
+from .. import Function, LocalPythonFunction, LocalValue
+from ..func.urifunc import URIFunction, URIValue
+from . import LocalExecutor, LocalURIExecutor, LocalURICachingExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+def function_key(func: Function) -> str:
+    """
+    identifies function regardless of bound arguments, statistics are collected by this key
+    """
+    provenance = func.provenance or []
+
+    if len(provenance) == 1 and provenance[0][0] == 'partial':
+        return function_key(provenance[0][3][0])
+
+    if isinstance(func, URIFunction):
+        return str(func.uri)
+
+    if isinstance(func, LocalPythonFunction):
+        f = func.local_python_function
+        return f"python:{getattr(f, '__module__', '')}.{getattr(f, '__qualname__', repr(f))}"
+
+    return func.__class__.__name__
+
+
+class ExecutionPlan:
+    """
+    decision on how to execute a function, with estimated costs in seconds and bytes
+    """
+
+    def __init__(self, func_key, action, executor, estimated_costs, reason) -> None:
+        self.func_key = func_key
+        self.action = action
+        self.executor = executor
+        self.estimated_costs = estimated_costs
+        self.reason = reason
+        self.measured_costs = {}
+
+    def to_dict(self):
+        return {
+            'function': self.func_key,
+            'action': self.action,
+            'executor': self.executor.__class__.__name__,
+            'estimated_costs': self.estimated_costs,
+            'measured_costs': self.measured_costs,
+            'reason': self.reason,
+        }
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.action} with {self.executor.__class__.__name__}: {self.reason}; estimated {self.estimated_costs}]"
+
+
+class ExecutionPlanner:
+    """
+    decides per call whether to read from cache, recompute, or compute without caching, from recorded runtime, result size and cache read cost
+    """
+
+    # functions faster than this are not worth caching
+    cheap_runtime = 0.01
+
+    # results larger than this are not worth caching
+    huge_result_size = 100 * 1024 * 1024
+
+    # used to estimate cache read cost until it is measured
+    cache_read_latency = 0.005
+    cache_read_bandwidth = 100 * 1024 * 1024
+
+    # weight of the latest measurement in the running averages
+    smoothing = 0.3
+
+    actions = ['read-cache', 'compute-and-cache', 'compute']
+
+    def __init__(self, stats_path=None, caching_executor=None) -> None:
+        if stats_path is None:
+            stats_path = pathlib.Path(os.environ['HOME']) / ".cache/odafunction/planner-stats.json"
+
+        self.stats_path = pathlib.Path(stats_path)
+        self._caching_executor = caching_executor
+        self.decisions = []
+
+        # executions may run in threads, all recording to the same statistics
+        self._lock = threading.Lock()
+
+        self.load_stats()
+
+    @property
+    def caching_executor(self):
+        if self._caching_executor is None:
+            self._caching_executor = LocalURICachingExecutor()
+
+        return self._caching_executor
+
+    def load_stats(self):
+        try:
+            with open(self.stats_path) as f:
+                self.stats = json.load(f)
+        except FileNotFoundError:
+            self.stats = {}
+
+    def save_stats(self):
+        os.makedirs(self.stats_path.parent, exist_ok=True)
+
+        with self._lock:
+            content = json.dumps(self.stats, indent=4, sort_keys=True)
+
+        # other processes save their statistics as well, each through own temporary file
+        tmp_path = self.stats_path.with_name(f".{self.stats_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(content)
+
+        os.replace(tmp_path, self.stats_path)
+
+    def record(self, func_key, **measurements):
+        with self._lock:
+            stats = self.stats.setdefault(func_key, {'n_runs': 0})
+
+            for k, v in measurements.items():
+                if v is None:
+                    continue
+
+                if stats.get(k) is None:
+                    stats[k] = v
+                else:
+                    stats[k] = (1 - self.smoothing) * stats[k] + self.smoothing * v
+
+            if 'runtime' in measurements:
+                stats['n_runs'] += 1
+
+    def estimate(self, func_key):
+        stats = self.stats.get(func_key, {})
+
+        result_size = stats.get('result_size')
+        cache_read = stats.get('cache_read')
+
+        if cache_read is None and result_size is not None:
+            cache_read = self.cache_read_latency + result_size / self.cache_read_bandwidth
+
+        return {
+            'runtime': stats.get('runtime'),
+            'result_size': result_size,
+            'cache_read': cache_read,
+        }
+
+    def plan(self, func: Function, cached=True, valueclass: type=LocalValue) -> ExecutionPlan:
+        func_key = function_key(func)
+        est = self.estimate(func_key)
+
+        def compute(reason):
+            if issubclass(valueclass, URIValue):
+                executor = LocalURIExecutor()
+            else:
+                executor = LocalExecutor()
+
+            return ExecutionPlan(func_key, 'compute', executor, est, reason)
+
+        if not cached:
+            plan = compute("caching not requested")
+        elif not isinstance(func, URIFunction):
+            plan = compute("function is not identified by URI and can not be cached")
+        elif self.caching_executor.lookup(func) is not None:
+            if est['runtime'] is not None and est['cache_read'] is not None and est['runtime'] < est['cache_read']:
+                plan = compute("recomputing is cheaper than reading from cache")
+            else:
+                plan = ExecutionPlan(func_key, 'read-cache', self.caching_executor, est, "cached result available")
+        elif est['runtime'] is not None and est['runtime'] < self.cheap_runtime:
+            plan = compute("cheap to recompute, not worth caching")
+        elif est['result_size'] is not None and est['result_size'] > self.huge_result_size:
+            plan = compute("result too large to cache")
+        else:
+            plan = ExecutionPlan(func_key, 'compute-and-cache', self.caching_executor, est, "no cached result")
+
+        logger.info("planned %s: %s", func, plan)
+        return plan
+
+    def result_size(self, r):
+        if isinstance(r, URIValue) and r.schema == 'file' and os.path.exists(r.path):
+            return os.path.getsize(r.path)
+
+        try:
+            return len(json.dumps(r.value))
+        except (TypeError, ValueError):
+            return None
+
+    def execute(self, func: Function, cached=True, valueclass: type=LocalValue) -> Function:
+        plan = self.plan(func, cached=cached, valueclass=valueclass)
+
+        t0 = time.time()
+        r = plan.executor(func)
+        dt = time.time() - t0
+
+        if plan.action == 'read-cache':
+            plan.measured_costs = {'cache_read': dt}
+            self.record(plan.func_key, cache_read=dt)
+        else:
+            plan.measured_costs = {'runtime': dt, 'result_size': self.result_size(r)}
+            self.record(plan.func_key, **plan.measured_costs)
+
+        self.decisions.append(plan)
+        self.save_stats()
+
+        logger.info("executed %s as planned: %s measured %s", func, plan.action, plan.measured_costs)
+        return r
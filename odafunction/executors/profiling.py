@@ -0,0 +1,155 @@
+import cProfile
+import hashlib
+import io
+import json
+import logging
+import os
+import pathlib
+import pstats
+import threading
+import time
+import tracemalloc
+
+from .. import Function
+from ..func.urifunc import URIFunction
+from .planner import function_key
+
+
+logger = logging.getLogger(__name__)
+
+# only one profiler can be active: executions nested in a profiled execution show up in its profile
+_profiling = threading.local()
+
+# and only one in the process, since python 3.12 also across threads: executions overlapping with a profiled one are only timed
+_profiler_lock = threading.Lock()
+
+
+def function_uri(func: Function):
+    if isinstance(func, URIFunction) and func.uri is not None:
+        return str(func.uri)
+
+    return function_key(func)
+
+
+class ProfileStore:
+    """
+    profiles of executions, in directories by function URI: <timestamp>.prof for pstats, and <timestamp>.json with metadata
+    """
+
+    n_top_allocations = 20
+
+    def __init__(self, path=None) -> None:
+        if path is None:
+            path = os.getenv("ODAFUNCTION_PROFILES", pathlib.Path(os.environ['HOME']) / ".cache/odafunction/profiles")
+
+        self.path = pathlib.Path(path)
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path}]"
+
+    def function_path(self, uri):
+        return self.path / hashlib.sha256(uri.encode()).hexdigest()[:32]
+
+    def record(self, func: Function, profile: cProfile.Profile, started, duration, memory_snapshot=None):
+        """
+        profile may be None, if the execution was only timed
+        """
+        uri = function_uri(func)
+        stem = self.function_path(uri) / f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{os.getpid()}-{threading.get_ident()}"
+        stem.parent.mkdir(parents=True, exist_ok=True)
+
+        if profile is not None:
+            profile.dump_stats(f"{stem}.prof")
+
+        entry = {
+            'uri': uri,
+            'function': function_key(func),
+            'started': started,
+            'duration': duration,
+            'profile': None if profile is None else f"{stem}.prof",
+        }
+
+        if memory_snapshot is not None:
+            stats = memory_snapshot.statistics("lineno")
+            entry['memory'] = {
+                'total': sum(s.size for s in stats),
+                'top': [{'where': str(s.traceback), 'size': s.size, 'count': s.count} for s in stats[:self.n_top_allocations]],
+            }
+
+        with open(f"{stem}.json", "w") as f:
+            json.dump(entry, f, indent=4, sort_keys=True)
+
+        logger.info("recorded profile of %s in %s: %.3g s", uri, stem, duration)
+        return entry
+
+    def entries(self, match=None):
+        for path in self.path.glob("*/*.json"):
+            with open(path) as f:
+                entry = json.load(f)
+
+            if match is None or match in entry['uri'] or match in entry['function']:
+                yield entry
+
+    def slowest(self, n=10, match=None):
+        return sorted(self.entries(match), key=lambda e: -e['duration'])[:n]
+
+    def report(self, profile_path, sort="cumulative", n=30):
+        s = io.StringIO()
+        pstats.Stats(str(profile_path), stream=s).sort_stats(sort).print_stats(n)
+        return s.getvalue()
+
+
+def profile_execution(func: Function, memory=False, store=None):
+    """
+    run the nullary function under cProfile, and, if memory, tracemalloc; record profile in the store
+    """
+    if getattr(_profiling, 'active', False):
+        logger.debug("%s is executed within profiled execution, not profiled separately", func)
+        return func.local_python_function()
+
+    if store is None:
+        store = ProfileStore()
+
+    if _profiler_lock.acquire(blocking=False):
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+        except ValueError as e:
+            # e.g. debugger or coverage
+            logger.warning("unable to profile %s, only timing it: %s", func, e)
+            profile = None
+            _profiler_lock.release()
+    else:
+        logger.info("another execution is being profiled, %s is only timed", func)
+        profile = None
+
+    # memory is traced by the process as well, only with the profiler
+    trace_memory = profile is not None and memory and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+
+    started = time.time()
+    _profiling.active = True
+
+    try:
+        v = func.local_python_function()
+    finally:
+        _profiling.active = False
+        duration = time.time() - started
+
+        snapshot = None
+
+        if profile is not None:
+            profile.disable()
+
+            if memory and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+
+            if trace_memory:
+                tracemalloc.stop()
+
+            _profiler_lock.release()
+
+    store.record(func, profile, started, duration, snapshot)
+    return v
@@ -0,0 +1,359 @@
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+import rdflib
+
+from .. import Executor, Function
+from ..func.urifunc import URIFunction, URIValue
+from . import AnyExecutor
+
+
+logger = logging.getLogger(__name__)
+
+# jobs are nullary functions, described by the URI of the function and the arguments bound to it
+# results are URIValue, workers and clients need to share the filesystem where they are written
+#
+# a claimed job is leased to the worker for lease_time seconds, and the worker renews the lease while the job runs.
+# if the worker dies, the lease expires and the job is given to another worker
+
+default_lease_time = 60.
+
+
+def job_from_function(func: Function) -> dict:
+    provenance = func.provenance or []
+
+    if len(provenance) == 1 and provenance[0][0] == 'partial':
+        _, (_, args), (_, kwargs), (base, base_provenance) = provenance[0]
+
+        if base_provenance:
+            raise NotImplementedError(f"can only queue functions partially applied once, got {func}")
+    elif isinstance(func, URIFunction) and not provenance:
+        base, args, kwargs = func, (), {}
+    else:
+        raise NotImplementedError(f"can not serialize {func} for queue: unsupported provenance")
+
+    if not isinstance(base, URIFunction):
+        raise NotImplementedError(f"can not serialize {func} for queue: {base} has no URI")
+
+    job = {'uri': str(base.uri), 'args': list(args), 'kwargs': kwargs}
+
+    try:
+        json.dumps(job)
+    except TypeError as e:
+        raise NotImplementedError(f"can not serialize arguments of {func} for queue: {e}")
+
+    return job
+
+
+def function_from_job(job: dict) -> Function:
+    return URIFunction.from_uri(job['uri'])(*job['args'], **job['kwargs'])
+
+
+class DirectoryJobQueue:
+    """
+    job queue in a shared directory: a job is claimed by atomic rename from pending/ to running/.
+    modification time of the running job is the end of its lease, set by the worker which holds it
+    """
+
+    def __init__(self, path, lease_time=default_lease_time) -> None:
+        self.path = pathlib.Path(path)
+        self.lease_time = lease_time
+
+        for state in ['pending', 'running', 'done']:
+            os.makedirs(self.path / state, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path}]"
+
+    def _write_atomic(self, path: pathlib.Path, content: dict):
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+
+        with open(tmp_path, "w") as f:
+            json.dump(content, f)
+
+        os.replace(tmp_path, path)
+
+    def submit(self, job: dict) -> str:
+        job_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        self._write_atomic(self.path / "pending" / f"{job_id}.json", job)
+        logger.info("submitted job %s to %s", job_id, self)
+        return job_id
+
+    def requeue_expired(self):
+        n = 0
+
+        for running_path in (self.path / "running").glob("*.json"):
+            # lease time of the worker which holds the job, not of this one
+            try:
+                expired = running_path.stat().st_mtime < time.time()
+            except FileNotFoundError:
+                continue
+
+            if not expired:
+                continue
+
+            try:
+                os.rename(running_path, self.path / "pending" / running_path.name)
+            except FileNotFoundError:
+                continue
+
+            logger.warning("lease of job %s in %s expired, worker is presumably gone; job is queued again", running_path.stem, self)
+            n += 1
+
+        return n
+
+    def claim(self):
+        self.requeue_expired()
+
+        for pending_path in sorted((self.path / "pending").glob("*.json")):
+            running_path = self.path / "running" / pending_path.name
+
+            # rename keeps modification time: lease is set before, so that the job is never running with an expired one
+            try:
+                self._set_leased_until(pending_path)
+                os.rename(pending_path, running_path)
+            except FileNotFoundError:
+                logger.debug("job %s was claimed by another worker", pending_path.stem)
+                continue
+
+            with open(running_path) as f:
+                return pending_path.stem, json.load(f)
+
+        return None
+
+    def _set_leased_until(self, path: pathlib.Path):
+        leased_until = time.time() + self.lease_time
+        os.utime(path, (leased_until, leased_until))
+
+    def renew(self, job_id: str):
+        try:
+            self._set_leased_until(self.path / "running" / f"{job_id}.json")
+        except FileNotFoundError:
+            logger.warning("job %s is not running in %s, unable to renew the lease", job_id, self)
+
+    def complete(self, job_id: str, result: dict):
+        self._write_atomic(self.path / "done" / f"{job_id}.json", result)
+
+        try:
+            os.remove(self.path / "running" / f"{job_id}.json")
+        except FileNotFoundError:
+            pass
+
+    def result(self, job_id: str):
+        try:
+            with open(self.path / "done" / f"{job_id}.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+class SQLiteJobQueue:
+    """
+    job queue in a single SQLite file, claimed in an immediate transaction
+    """
+
+    def __init__(self, path, lease_time=default_lease_time) -> None:
+        self.path = pathlib.Path(path)
+        self.lease_time = lease_time
+
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, job TEXT, state TEXT, result TEXT, created REAL, leased_until REAL)")
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path}]"
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # autocommit, transactions are explicit; connection is closed after each use
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, job: dict) -> str:
+        job_id = uuid.uuid4().hex
+
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, job, state, created) VALUES (?, ?, 'pending', ?)", (job_id, json.dumps(job), time.time()))
+
+        logger.info("submitted job %s to %s", job_id, self)
+        return job_id
+
+    def claim(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+
+            now = time.time()
+            n_expired = conn.execute("UPDATE jobs SET state = 'pending' WHERE state = 'running' AND leased_until < ?", (now,)).rowcount
+            if n_expired > 0:
+                logger.warning("leases of %s jobs in %s expired, workers are presumably gone; jobs are queued again", n_expired, self)
+
+            row = conn.execute("SELECT id, job FROM jobs WHERE state = 'pending' ORDER BY created LIMIT 1").fetchone()
+
+            if row is not None:
+                conn.execute("UPDATE jobs SET state = 'running', leased_until = ? WHERE id = ?", (now + self.lease_time, row[0]))
+
+            conn.execute("COMMIT")
+
+        if row is None:
+            return None
+
+        return row[0], json.loads(row[1])
+
+    def renew(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET leased_until = ? WHERE id = ? AND state = 'running'", (time.time() + self.lease_time, job_id))
+
+    def complete(self, job_id: str, result: dict):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET state = 'done', result = ? WHERE id = ?", (json.dumps(result), job_id))
+
+    def result(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ? AND state = 'done'", (job_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        return json.loads(row[0])
+
+
+def open_job_queue(location, lease_time=default_lease_time):
+    if isinstance(location, (DirectoryJobQueue, SQLiteJobQueue)):
+        return location
+
+    if str(location).endswith((".sqlite", ".db")):
+        return SQLiteJobQueue(location, lease_time=lease_time)
+    else:
+        return DirectoryJobQueue(location, lease_time=lease_time)
+
+
+class LeaseRenewal:
+    """
+    renews the lease of a job in background, while the job runs
+    """
+
+    def __init__(self, queue, job_id) -> None:
+        self.queue = queue
+        self.job_id = job_id
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"odaf-lease-{job_id}")
+
+    def _run(self):
+        while not self._stopped.wait(self.queue.lease_time / 3):
+            try:
+                self.queue.renew(self.job_id)
+            except Exception as e:
+                logger.warning("unable to renew lease of job %s: %s", self.job_id, repr(e))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+
+def execute_job(job: dict, cached=True) -> dict:
+    if cached:
+        selector = lambda ex: getattr(ex, 'caching', False)
+    else:
+        selector = lambda ex: True
+
+    try:
+        func = function_from_job(job)
+        func.cached = cached
+        r = AnyExecutor(executor_selector=selector)(func, URIValue)
+    except Exception as e:
+        logger.error("job %s failed: %s", job, repr(e))
+        return {'error': repr(e), 'traceback': traceback.format_exc()}
+
+    return {'value_uri': str(r.uri)}
+
+
+def run_worker(queue, cached=True, max_jobs=None, idle_timeout=None, poll_interval=1., lease_time=default_lease_time):
+    """
+    pull jobs from the queue and execute them, until max_jobs are done or queue is idle for idle_timeout
+    """
+
+    queue = open_job_queue(queue, lease_time=lease_time)
+
+    n_done = 0
+    idle_since = time.time()
+
+    while max_jobs is None or n_done < max_jobs:
+        claimed = queue.claim()
+
+        if claimed is None:
+            if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                logger.info("worker idle for %s s, stopping", idle_timeout)
+                break
+
+            time.sleep(poll_interval)
+            continue
+
+        job_id, job = claimed
+        logger.info("worker running job %s: %s", job_id, job)
+
+        with LeaseRenewal(queue, job_id):
+            result = execute_job(job, cached=cached)
+
+        queue.complete(job_id, result)
+
+        n_done += 1
+        idle_since = time.time()
+
+    return n_done
+
+
+class QueueExecutor(Executor):
+    """
+    submits nullary functions to a job queue, and waits for workers to produce URIValue
+    """
+
+    # should not be picked by AnyExecutor: needs a queue, and workers to serve it
+    auto_selectable = False
+
+    def __init__(self, queue, poll_interval=0.5, timeout=None) -> None:
+        self.queue = open_job_queue(queue)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def submit(self, func: Function) -> str:
+        return self.queue.submit(job_from_function(func))
+
+    def wait(self, job_id: str) -> URIValue:
+        t0 = time.time()
+
+        while True:
+            result = self.queue.result(job_id)
+
+            if result is not None:
+                break
+
+            if self.timeout is not None and time.time() - t0 > self.timeout:
+                raise TimeoutError(f"job {job_id} in {self.queue} did not complete in {self.timeout} s")
+
+            time.sleep(self.poll_interval)
+
+        if 'error' in result:
+            raise RuntimeError(f"job {job_id} failed in worker: {result['error']}", result.get('traceback'))
+
+        return URIValue(uri=rdflib.URIRef(result['value_uri']))
+
+    def map(self, funcs) -> list:
+        job_ids = [self.submit(func) for func in funcs]
+        return [self.wait(job_id) for job_id in job_ids]
+
+    def __call__(self, func: URIFunction) -> URIValue:
+        return self.wait(self.submit(func))
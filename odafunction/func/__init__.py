@@ -0,0 +1,2 @@
+# function types register their URIs on import
+from . import urifunc, httpapifunc, modulefunc
@@ -0,0 +1,112 @@
+import hashlib
+import importlib.util
+import logging
+import marshal
+import os
+import pathlib
+import sys
+import threading
+import types
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+# function sources loaded from files and http are compiled once: code is cached by hash of the source,
+# in memory for this process, and on disk for the next ones. cache files are only valid for the same python, by magic number.
+# the same source may be in several files: cached code gets the file name of each, for tracebacks and inspect
+
+
+def with_filename(code, filename):
+    """
+    code, and code nested in it, e.g. of functions, as if compiled from the file
+    """
+    if code.co_filename == filename:
+        return code
+
+    consts = tuple(with_filename(c, filename) if isinstance(c, types.CodeType) else c for c in code.co_consts)
+
+    return code.replace(co_filename=filename, co_consts=consts)
+
+
+class BytecodeCache:
+    def __init__(self, path=None) -> None:
+        if path is None:
+            path = os.getenv("ODAFUNCTION_BYTECODE_CACHE", pathlib.Path(os.environ['HOME']) / ".cache/odafunction/bytecode")
+
+        self.path = pathlib.Path(path)
+        self._memory = {}
+        self._lock = threading.Lock()
+        self.n_compiled = 0
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path}]"
+
+    def code_path(self, source_hash):
+        return self.path / f"{source_hash}.{sys.implementation.cache_tag}.pyc"
+
+    def _load(self, source_hash):
+        try:
+            with open(self.code_path(source_hash), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        magic = importlib.util.MAGIC_NUMBER
+
+        if data[:len(magic)] != magic:
+            logger.warning("bytecode cache %s for %s is for another python, ignoring it", self, source_hash)
+            return None
+
+        try:
+            return marshal.loads(data[len(magic):])
+        except (EOFError, ValueError, TypeError) as e:
+            logger.warning("bytecode cache %s for %s is broken: %s", self, source_hash, repr(e))
+            return None
+
+    def _store(self, source_hash, code):
+        path = self.code_path(source_hash)
+
+        try:
+            os.makedirs(path.parent, exist_ok=True)
+            tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+
+            with open(tmp_path, "wb") as f:
+                f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # cache is an optimization, read-only home is fine
+            logger.warning("unable to store bytecode in %s: %s", self, repr(e))
+
+    def code(self, source: bytes, filename):
+        """
+        code object of the source, compiled only if not yet cached
+        """
+        source_hash = hashlib.sha256(source).hexdigest()
+        filename = str(filename)
+
+        with self._lock:
+            code = self._memory.get(source_hash)
+
+        if code is not None:
+            return with_filename(code, filename)
+
+        code = self._load(source_hash)
+
+        if code is None:
+            logger.info("compiling %s", filename)
+            code = compile(source, filename, "exec", dont_inherit=True)
+            self.n_compiled += 1
+            self._store(source_hash, code)
+        else:
+            logger.info("using cached bytecode of %s", filename)
+            code = with_filename(code, filename)
+
+        with self._lock:
+            self._memory[source_hash] = code
+
+        return code
+
+
+bytecode_cache = BytecodeCache()
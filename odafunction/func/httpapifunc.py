@@ -0,0 +1,188 @@
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .urifunc import URIPythonFunction, register_uri_function
+
+
+logger = logging.getLogger(__name__)
+
+# remote service endpoint as a function: httpapi+https://host/base::endpoint is called by POST of JSON arguments to https://host/base/endpoint,
+# and JSON response is the value. it is partially applied, executed and cached like any python function
+
+
+class RateLimiter:
+    """
+    token bucket: at most rate calls per second on average, and burst at once
+    """
+
+    def __init__(self, rate, burst=1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+# connections, concurrency limits and rate limits are shared by all functions of the same host with the same settings
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+class HTTPAPIHost:
+    def __init__(self, max_concurrency, rate_limit=None, retries=3, retry_post=False) -> None:
+        self.session = requests.Session()
+
+        # calls are POST, which are not idempotent in general: a retried call might be executed twice
+        allowed_methods = None if retry_post else Retry.DEFAULT_ALLOWED_METHODS
+
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max_concurrency,
+            max_retries=Retry(total=retries, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504], allowed_methods=allowed_methods),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.rate_limiter = None if rate_limit is None else RateLimiter(rate_limit, burst=max_concurrency)
+        self.n_requests = 0
+
+    def post(self, url, data, timeout):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        with self.semaphore:
+            self.n_requests += 1
+            response = self.session.post(url, json=data, timeout=timeout)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"remote function {url} responded {response.status_code}: {response.text[:1000]}")
+
+        return response.json()
+
+
+def http_api_host(base_url, max_concurrency, rate_limit=None, retry_post=False):
+    key = (base_url, max_concurrency, rate_limit, retry_post)
+
+    with _hosts_lock:
+        if key not in _hosts:
+            _hosts[key] = HTTPAPIHost(max_concurrency, rate_limit, retry_post=retry_post)
+
+        return _hosts[key]
+
+
+@register_uri_function(modifier="httpapi", schema=("http", "https"))
+class URIHTTPAPIFunction(URIPythonFunction):
+    """
+    parameters: names of parameters, keyword-only; by default any keywords are accepted
+    batch_url: endpoint taking list of argument dicts and returning list of values, for fused calls
+    idempotent: failed calls are retried only if the endpoint can safely be called twice
+    """
+
+    suffix = None
+
+    # limits per host
+    max_concurrency = 8
+    rate_limit = None
+
+    max_batch_size = 100
+    timeout = 300
+
+    idempotent = False
+
+    def __init__(self, uri=None, func=None, provenance=None, parameters=None, batch_url=None, idempotent=None, **kwargs) -> None:
+        self.parameters = parameters
+        self.batch_url = batch_url
+
+        if idempotent is not None:
+            self.idempotent = idempotent
+
+        super().__init__(uri=uri, func=func, provenance=provenance, **kwargs)
+
+    @property
+    def url(self):
+        url = f"{self.schema}://{self.path}"
+
+        if self.funcname is not None:
+            url += "/" + self.funcname
+
+        return url
+
+    @property
+    def host(self):
+        return http_api_host(f"{self.schema}://{self.path.split('/')[0]}", self.max_concurrency, self.rate_limit, retry_post=self.idempotent)
+
+    @property
+    def content_revision(self):
+        # remote service has no source to hash
+        return None
+
+    def load_func(self):
+        if self.schema not in ["http", "https"]:
+            raise NotImplementedError
+
+        def local_python_function(**kwargs):
+            logger.info("calling remote function %s with %s", self.url, kwargs)
+            return self.host.post(self.url, kwargs, self.timeout)
+
+        if self.parameters is None:
+            local_python_function.__signature__ = inspect.Signature([inspect.Parameter("kwargs", inspect.Parameter.VAR_KEYWORD)])
+        else:
+            local_python_function.__signature__ = inspect.Signature([inspect.Parameter(p, inspect.Parameter.KEYWORD_ONLY) for p in self.parameters])
+
+        self.local_python_function = local_python_function
+
+        if self.batch_url is not None:
+            self.batched = self.call_batch
+
+    def call_batch(self, **columns):
+        """
+        batched implementation: each parameter is given as list of values of many calls
+        """
+        if 'kwargs' in columns and self.parameters is None:
+            calls = columns['kwargs']
+        else:
+            calls = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+        results = []
+        for i in range(0, len(calls), self.max_batch_size):
+            chunk = calls[i:i + self.max_batch_size]
+            logger.info("calling remote function %s with batch of %s", self.batch_url, len(chunk))
+
+            values = self.host.post(self.batch_url, chunk, self.timeout)
+
+            if not isinstance(values, list) or len(values) != len(chunk):
+                raise RuntimeError(f"remote function {self.batch_url} returned unexpected batch result for {len(chunk)} calls")
+
+            results += values
+
+        return results
+
+    def call_many(self, calls, max_workers=None):
+        """
+        values for many argument dicts, requested concurrently within limits of the host
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_concurrency, thread_name_prefix="odaf-httpapi") as pool:
+            return list(pool.map(lambda kwargs: self.local_python_function(**kwargs), calls))
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+def source_url(uri):
+    """
+    location of the function source: URI without modifier, function name and revision
+    """
+    r = re.match(r"^((ipynb|py)\+)?(?P<schema>(http|https|file))://(?P<path>.*?)(::.*?)?(@.*)?$", str(uri))
+
+    if r is None:
+        raise RuntimeError(f"URI {uri} does not look right")
+
+    return f"{r.group('schema')}://{r.group('path')}"
+
+
+class FunctionMirror:
+    """
+    local copies of remote function sources, each recorded with hash and remote revision
+
+    records/ hold metadata by source URL, objects/ hold content by hash
+    """
+
+    def __init__(self, path=None) -> None:
+        if path is None:
+            path = os.getenv("ODAFUNCTION_MIRROR", pathlib.Path(os.environ['HOME']) / ".cache/odafunction/mirror")
+
+        self.path = pathlib.Path(path)
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path}]"
+
+    def record_path(self, url):
+        return self.path / "records" / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
+
+    def object_path(self, sha256):
+        return self.path / "objects" / sha256
+
+    def record(self, url):
+        try:
+            with open(self.record_path(url)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def records(self):
+        for record_path in sorted((self.path / "records").glob("*.json")):
+            with open(record_path) as f:
+                yield json.load(f)
+
+    def get(self, url):
+        """
+        content of the source if mirrored and matching recorded hash, else None
+        """
+        record = self.record(url)
+
+        if record is None:
+            return None
+
+        try:
+            with open(self.object_path(record['sha256']), "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            logger.warning("mirror %s has record for %s but no content", self, url)
+            return None
+
+        if hashlib.sha256(content).hexdigest() != record['sha256']:
+            logger.warning("mirror %s copy of %s does not match recorded hash, ignoring it", self, url)
+            return None
+
+        return content
+
+    def add(self, url, content, revision=None):
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        self._write_atomic(self.object_path(sha256), content)
+
+        record = {
+            'url': url,
+            'sha256': sha256,
+            'revision': revision or {},
+            'fetched_at': time.time(),
+        }
+        self._write_atomic(self.record_path(url), json.dumps(record, sort_keys=True).encode())
+
+        logger.info("mirrored %s as %s", url, sha256)
+        return record
+
+    def fetch(self, url, session=None):
+        if session is None:
+            session = requests
+
+        response = session.get(url)
+        response.raise_for_status()
+
+        revision = {k.lower(): v for k, v in response.headers.items() if k.lower() in ['etag', 'last-modified']}
+
+        return self.add(url, response.content, revision)
+
+    def prefetch(self, uris, max_workers=8):
+        """
+        fetch sources of remote functions in parallel; returns dict by URL of records, or exceptions for failed fetches
+        """
+        urls = sorted({source_url(uri) for uri in uris if re.match(r"^((ipynb|py)\+)?https?://", str(uri))})
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        def fetch(url):
+            try:
+                return self.fetch(url, session=session)
+            except Exception as e:
+                logger.error("failed to prefetch %s: %s", url, repr(e))
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="odaf-mirror") as pool:
+            results = dict(zip(urls, pool.map(fetch, urls)))
+
+        session.close()
+        return results
+
+    def _write_atomic(self, path, content):
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+
+        os.replace(tmp_path, path)
@@ -1,4 +1,37 @@
-from . import Function, LocalValue, Executor
+import importlib
+import logging
 
+from .urifunc import URIPythonFunction, register_uri_function, source_content_hash
 
-# class 
\ No newline at end of file
+
+logger = logging.getLogger(__name__)
+
+# module://package.module::func is found by the import system, in sys.modules if already imported, like any import in the code
+
+
+@register_uri_function(schema="module", funcname=True)
+class URIModuleFunction(URIPythonFunction):
+    suffix = None
+
+    def load_func(self):
+        if self.schema != "module":
+            raise NotImplementedError
+
+        try:
+            module = importlib.import_module(self.path)
+        except ImportError as e:
+            raise RuntimeError(f"unable to import module {self.path} for {self.uri}: {e!r}")
+
+        self.module = module
+        self.source_path = getattr(module, '__file__', None)
+
+        f = module
+        for name in self.funcname.split("."):
+            f = getattr(f, name)
+
+        logger.info("found %s in module %s", self.funcname, module)
+        self.local_python_function = f
+
+        # source of the module, if it has a file: changes to other modules of the package are not followed
+        if self.source_path is not None and self.source_path.endswith(".py"):
+            self.loaded_content_revision = source_content_hash(self.source_path)
@@ -2,6 +2,7 @@
 # remote python function, retrievable by file://, http://, with :: function in it
 # 
 
+import functools
 import hashlib
 import inspect
 import os
@@ -10,11 +11,16 @@ import importlib.util
 import json
 from pathlib import Path
 import tempfile
+import uuid
 from typing import Any
 from nb2workflow.nbadapter import NotebookAdapter
 from nb2workflow.workflows import serialize_workflow_exception
 from .. import LocalPythonFunction, Function, LocalValue, Executor
-from ..utils import iterate_subclasses, repr_trim
+from ..utils import repr_trim
+from ..arghash import argument_digest
+from .mirror import FunctionMirror
+from .bytecode import bytecode_cache
+from ..compression import open_maybe_compressed, write_maybe_compressed, open_for_writing
 
 import re
 import logging
@@ -29,7 +35,79 @@ class FuncJSONEncoder(json.JSONEncoder):
         if isinstance(obj, Function) or isinstance(obj, Executor):
             return f"[{obj.__class__.__name__}:{getattr(obj, 'uri', '')}]"
         else:
-            return json.JSONEncoder.default(self, obj)
+            # only for logging: large or binary arguments are not dumped
+            return repr_trim(obj, 100)
+
+
+uri_regex = re.compile(r"^((?P<modifier>[a-z0-9]+)\+)?(?P<schema>[a-z][a-z0-9.-]*)://(?P<path>.*?)(::(?P<funcname>.*?))?(@(?P<revision>.*))?$")
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_uri_parts(uri):
+    r = uri_regex.match(uri)
+
+    if r is None:
+        raise RuntimeError(f"URI {uri} does not look right")
+
+    parts = r.groupdict()
+
+    name = parts['path'].rsplit("/", 1)[-1]
+    parts['suffix'] = name.rsplit(".", 1)[-1] if "." in name else None
+
+    return parts
+
+
+def parse_uri_parts(uri):
+    """
+    modifier, schema, path, funcname, revision and suffix of function URI
+    """
+    return dict(_parse_uri_parts(str(uri)))
+
+
+# function types by URI: (conditions, class). modifier in URI has to be registered explicitly.
+uri_function_registry = []
+
+# when several registrations match, the most specific wins; later ones win ties
+_uri_condition_weights = {'modifier': 8, 'suffix': 4, 'schema': 2, 'funcname': 1}
+
+
+def register_uri_function(modifier=None, schema=None, suffix=None, funcname=None):
+    """
+    class decorator, registers function type for URIs like modifier+schema://path.suffix::funcname
+
+    schema: name or tuple of names, None for any
+    funcname: True if URI must have ::funcname, False if it must not, None for any
+    """
+    def register(cls):
+        uri_function_registry.append((dict(modifier=modifier, schema=schema, suffix=suffix, funcname=funcname), cls))
+        return cls
+
+    return register
+
+
+def resolve_uri_function_class(parts):
+    best, best_score = None, -1
+
+    for conditions, cls in uri_function_registry:
+        if conditions['modifier'] != parts['modifier']:
+            continue
+
+        schema = conditions['schema']
+        if schema is not None and parts['schema'] not in ((schema,) if isinstance(schema, str) else schema):
+            continue
+
+        if conditions['suffix'] is not None and conditions['suffix'] != parts['suffix']:
+            continue
+
+        if conditions['funcname'] is not None and conditions['funcname'] != (parts['funcname'] is not None):
+            continue
+
+        score = sum(weight for k, weight in _uri_condition_weights.items() if conditions[k] is not None)
+
+        if score >= best_score:
+            best, best_score = cls, score
+
+    return best
 
 
 class URIFunction(Function):
@@ -63,39 +141,35 @@ class URIFunction(Function):
 
     def parse_uri(self, uri):
         logger.info("parsing URI %s", repr_trim(uri))
-        r = re.match(r"^((?P<modifier>(ipynb|py))\+)?(?P<schema>(http|https|file))://(?P<path>.*?)(::(?P<funcname>.*?))?(@(?P<revision>.*))?$", uri)
-        if r is None:            
-            raise RuntimeError(f"URI {uri} does not look right")
-        else:
-            logger.info("parsed uri %s as %s", uri, r.groupdict())
-            self.uri = uri
-            self.modifier = r.group('modifier')
-            self.schema = r.group('schema')
-            self.path = r.group('path')
-            self.funcname = r.group('funcname') 
-            self.revision = r.group('revision')
+        parts = parse_uri_parts(uri)
+
+        logger.info("parsed uri %s as %s", uri, parts)
+        self.uri = uri
+        self.modifier = parts['modifier']
+        self.schema = parts['schema']
+        self.path = parts['path']
+        self.funcname = parts['funcname']
+        self.revision = parts['revision']
 
 
 
     @staticmethod
     def from_uri(uri):
-        for cls in iterate_subclasses(URIFunction):
-            if cls in [Function, URIFunction]:
-                continue
-
-            try:
-                # TODO: not only first!
-                return cls(uri=uri)
-            except RuntimeError as e:
-                logger.info("can not parse %s as %s due to %s", uri, cls, repr(e))
-        
-        raise RuntimeError(f"unable to parse URI {uri}")
+        # one parse of the URI selects the class, only this class loads the function
+        cls = resolve_uri_function_class(parse_uri_parts(uri))
+
+        if cls is None:
+            raise RuntimeError(f"unable to parse URI {uri}: no function type registered for it")
+
+        logger.info("URI %s resolved to %s", uri, cls)
+        return cls(uri=uri)
 
 
     # TODO: this might rather belong to an partial executor
     def construct_uri_from_provenance(self):
         # TODO: here, also construct annotations
-        logger.info("prov:\n %s", json.dumps(self.provenance, indent=4, sort_keys=True, cls=FuncJSONEncoder))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("prov:\n %s", json.dumps(self.provenance, indent=4, sort_keys=True, cls=FuncJSONEncoder))
                 
         self.uri = uri_from_provenance(self.provenance)
                 
@@ -129,7 +203,7 @@ def uri_segments_from_provenance(p):
         segments += uri_segments_from_provenance(p[3])
 
     elif p[0] == 'partial':
-        segments.append(hashlib.md5(json.dumps([p[1:3]]).encode()).hexdigest()[:8])
+        segments.append(argument_digest([p[1:3]])[:8])
         segments.append(codify(p[3][0]))
         segments += uri_segments_from_provenance(p[3][1])
     elif isinstance(p, (list, tuple)):
@@ -151,7 +225,7 @@ def uri_from_provenance(p):
         segments.insert(0, f"file://{os.getenv('HOME')}/urivalue/")
 
     for i in range(1, len(segments)):
-        segments[i] = re.sub(r"(ipynb|py\+)?(file|http|https)://", "", segments[i])
+        segments[i] = re.sub(r"(ipynb|py\+)?(file|http|https|module)://", "", segments[i])
 
     for i in range(len(segments)):
         segments[i] = re.sub("@", "/", segments[i])
@@ -161,6 +235,59 @@ def uri_from_provenance(p):
 
 
 
+# source hashes are recomputed only when file mtime or size changes
+_source_content_hash_memory = {}
+
+def source_content_hash(path):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    memo = _source_content_hash_memory.get(path)
+    if memo is not None and memo[0] == stamp:
+        return memo[1]
+
+    with open(path, "rb") as f:
+        h = hashlib.sha256(f.read()).hexdigest()[:16]
+
+    logger.debug("computed content hash of %s: %s", path, h)
+    _source_content_hash_memory[path] = (stamp, h)
+    return h
+
+
+def current_content_revision(uri):
+    # revision of function source by URI, without loading the function. only possible for local files
+    r = re.match(r"^((ipynb|py)\+)?file://(?P<path>.*?)(::.*?)?(@.*)?$", str(uri))
+
+    if r is None or not os.path.exists(r.group('path')):
+        return None
+
+    return source_content_hash(r.group('path'))
+
+
+def function_revisions(func):
+    """
+    content revisions of all URI functions used in provenance of func, including nested arguments
+    """
+
+    revisions = {}
+
+    def walk(p):
+        if isinstance(p, Function):
+            if isinstance(p, URIFunction) and p.content_revision is not None:
+                revisions[str(p.uri)] = p.content_revision
+            walk(p.provenance)
+        elif isinstance(p, dict):
+            for v in p.values():
+                walk(v)
+        elif isinstance(p, (list, tuple)):
+            for e in p:
+                walk(e)
+
+    walk(func)
+    return revisions
+
+
 class URIFileFunction(URIFunction):
     """
     when URI actually represents a file which can be stored locally and loaded
@@ -172,8 +299,9 @@ class URIFileFunction(URIFunction):
         if value is None:
             self.load_func()
         else:
-            self.write_to_uri(value)
+            # write_to_uri may replace value, e.g. by a view of what was written
             self._value = value
+            self.write_to_uri(value)
 
         if verify_revision:
             if (self.revision or "") != self.actual_revision_str:
@@ -197,17 +325,34 @@ class URIFileFunction(URIFunction):
         return {}
 
 
+    @property
+    def content_revision(self):
+        # hash of the function source, if known. unlike actual_revision_dict, it is not part of the URI
+        return None
+
+
     def write_to_uri(self, value):
         logger.warning("asked to [red]write_to_uri[/] [b]%s[/] but this function has no persistent representation", self)
         
 
     def load_func(self):        
         if self.schema == "file":
+            self.source_path = self.path
             self.load_func_from_local_file(self.path)
 
         elif self.schema in ["http", "https"]:
+            url = f"{self.schema}://{self.path}"
+
+            self.content = FunctionMirror().get(url)
+            if self.content is None:
+                self.content = requests.get(url).content
+            else:
+                logger.info("using certified local copy of %s", url)
+
+            # temporary file is gone after loading: code refers to the URL instead
+            self.source_name = url
+
             with tempfile.NamedTemporaryFile(suffix="." + self.suffix) as f:
-                self.content = requests.get(f"{self.schema}://{self.path}").content
                 f.write(self.content)
                 f.flush()
                 self.load_func_from_local_file(f.name)
@@ -221,8 +366,13 @@ class URIFileFunction(URIFunction):
 
 
 
+@register_uri_function(modifier="py", funcname=True)
+@register_uri_function(suffix="py", funcname=True)
 class URIPythonFunction(URIFileFunction, LocalPythonFunction):
     suffix="py"
+
+    # sources are compiled once, by content
+    bytecode_cache = bytecode_cache
     
 
     def __init__(self, uri=None, func=None, provenance=None, **kwargs) -> None:
@@ -241,13 +391,21 @@ class URIPythonFunction(URIFileFunction, LocalPythonFunction):
         else:
             module = importlib.util.module_from_spec(spec)
 
-            if spec.loader is None:
-                raise RuntimeError(f"spec.loader is None for {path}")
-            else:
-                spec.loader.exec_module(module)
-                self.local_python_function = getattr(module, self.funcname)
+            with open(path, "rb") as f:
+                source = f.read()
 
+            exec(self.bytecode_cache.code(source, getattr(self, 'source_name', path)), module.__dict__)
+            self.local_python_function = getattr(module, self.funcname)
 
+            # revision of what was compiled, the file may change later
+            self.loaded_content_revision = hashlib.sha256(source).hexdigest()[:16]
+
+
+
+
+    @property
+    def content_revision(self):
+        return getattr(self, 'loaded_content_revision', None)
 
 
     def __repr__(self) -> str:
@@ -263,6 +421,8 @@ class URIPythonFunction(URIFileFunction, LocalPythonFunction):
         return f
 
 
+@register_uri_function(modifier="ipynb")
+@register_uri_function(suffix="ipynb")
 class URIipynbFunction(URIPythonFunction):
     suffix = "ipynb"
 
@@ -297,6 +457,8 @@ class URIipynbFunction(URIPythonFunction):
 
 
     def load_func_from_local_file(self, path):
+        self.loaded_content_revision = source_content_hash(path)
+
         nba = NotebookAdapter(path)
         
         self.parameters = nba.extract_parameters()
@@ -363,6 +525,34 @@ class TransformURIFunction(LocalPythonFunction):
 
 
 
+class StreamedValue:
+    """
+    lazy view of a value stored as JSON lines, each iteration reads the items from the file one by one
+    """
+
+    # first line of stream file: it is not JSON, so no stored JSON value can be mistaken for a stream
+    header = "#odafunction-stream 1"
+
+    def __init__(self, path) -> None:
+        self.path = path
+
+    @classmethod
+    def is_stream_file(cls, path):
+        with open_maybe_compressed(path) as f:
+            return f.read(len(cls.header) + 1) == cls.header + "\n"
+
+    def __iter__(self):
+        with open_maybe_compressed(self.path) as f:
+            f.readline()
+
+            for line in f:
+                yield json.loads(line)
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path}]"
+
+
+@register_uri_function(schema="file", funcname=False)
 class URIValue(URIFileFunction, LocalValue):
     """
     nullary function returning value stored as byte content at URI
@@ -370,6 +560,10 @@ class URIValue(URIFileFunction, LocalValue):
 
     # cached = True
 
+    # None means configured by ODAFUNCTION_COMPRESSION and ODAFUNCTION_COMPRESSION_THRESHOLD
+    compression = None
+    compression_threshold = None
+
                 
     def write_to_uri(self, value):
         if self.schema != 'file':
@@ -377,8 +571,32 @@ class URIValue(URIFileFunction, LocalValue):
 
         os.makedirs(Path(self.path).parent, exist_ok=True)
 
-        with open(self.path, "w") as f:
-            json.dump(value, f)
+        if inspect.isgenerator(value) or isinstance(value, StreamedValue):
+            self.write_stream_to_uri(iter(value))
+        else:
+            write_maybe_compressed(self.path, json.dumps(value), codec=self.compression, threshold=self.compression_threshold)
+
+
+    def write_stream_to_uri(self, items):
+        # items are written as they are produced; file appears only when the generator is exhausted
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.partial"
+
+        n = 0
+        try:
+            with open_for_writing(tmp_path, codec=self.compression) as f:
+                f.write(StreamedValue.header + "\n")
+
+                for item in items:
+                    f.write(json.dumps(item) + "\n")
+                    n += 1
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        os.replace(tmp_path, self.path)
+        logger.info("streamed %s items to %s", n, self.path)
+
+        self._value = StreamedValue(self.path)
 
 
     @property
@@ -394,7 +612,11 @@ class URIValue(URIFileFunction, LocalValue):
     def load_func_from_local_file(self, path):
         logger.info("load from local file: %s", path)
 
-        with open(path, "r") as f:
+        if StreamedValue.is_stream_file(path):
+            self._value = StreamedValue(path)
+            return
+
+        with open_maybe_compressed(path) as f:
             self._value = json.load(f)
 
 
@@ -108,3 +108,59 @@ class AppLogging:
         return logger
 
 app_logging = AppLogging()
+
+
+def all_loggers():
+    yield logging.getLogger()
+
+    for logger in list(logging.root.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger):
+            yield logger
+
+
+def configure_cli_logging(level, logspec=None):
+    """
+    logging of one command line invocation. returns function restoring logging as it was:
+    the command may run within another program, e.g. tests, which should not inherit levels and handlers
+    """
+    root = logging.getLogger()
+
+    saved_levels = {logger.name: logger.level for logger in all_loggers()}
+    saved_formatters = [(handler, handler.formatter) for logger in all_loggers() for handler in logger.handlers]
+    saved_root_handlers = list(root.handlers)
+
+    # handlers of the hosting program are set aside, not closed: they are back after the command
+    for handler in saved_root_handlers:
+        root.removeHandler(handler)
+
+    logging.basicConfig(
+        level=level, 
+        datefmt="[%X]",
+        format="%(name)30s %(levelname)8s %(message)s"
+    )
+
+    logging.getLogger().info("test info")
+
+    if logspec is not None:
+        app_logging.parse_logspec(logspec)
+
+    app_logging.setup()
+
+    def restore():
+        for handler in list(root.handlers):
+            if handler not in saved_root_handlers:
+                root.removeHandler(handler)
+                handler.close()
+
+        for handler in saved_root_handlers:
+            if handler not in root.handlers:
+                root.addHandler(handler)
+
+        for handler, formatter in saved_formatters:
+            handler.setFormatter(formatter)
+
+        for logger in all_loggers():
+            logger.setLevel(saved_levels.get(logger.name, logging.NOTSET))
+
+    return restore
+
@@ -0,0 +1,253 @@
+import fcntl
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+
+from . import LocalValue
+from .utils import repr_trim
+
+
+logger = logging.getLogger(__name__)
+
+# large buffer values (numpy arrays, bytes) are passed between processes by reference to a memory-mapped file, by default in /dev/shm.
+# every process holding a view keeps a shared lock on the file, which the system drops when the view is collected or the process dies.
+# the file is removed once its creator released it and nobody holds a lock; memory is freed by the system once the last mapping is gone.
+#
+# multiprocessing.shared_memory is not used: its resource tracker removes segments when any attached process exits
+
+header_size = 64
+
+default_shared_threshold = 1024 * 1024
+
+# values left behind are swept when values are shared, but not more often than this
+sweep_interval = 60
+
+_last_sweep = {}
+_sweep_lock = threading.Lock()
+
+
+def shared_value_dir(directory=None):
+    if directory is None:
+        directory = os.getenv("ODAFUNCTION_SHARED_DIR")
+
+    if directory is None:
+        if os.path.isdir("/dev/shm"):
+            directory = f"/dev/shm/odafunction-{os.getuid()}"
+        else:
+            directory = os.path.join(tempfile.gettempdir(), f"odafunction-shared-{os.getuid()}")
+
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def shared_value_threshold(threshold=None):
+    if threshold is None:
+        threshold = int(os.getenv("ODAFUNCTION_SHARED_THRESHOLD", default_shared_threshold))
+
+    return threshold
+
+
+def is_shareable(value, threshold=None):
+    """
+    whether value is a buffer large enough to be worth passing by reference
+    """
+    try:
+        mv = memoryview(value)
+    except TypeError:
+        return False
+
+    return mv.nbytes >= shared_value_threshold(threshold)
+
+
+def _mark_released(path):
+    with open(path, "r+b") as f:
+        f.write(struct.pack("q", 1))
+
+
+def _remove_if_unused(path):
+    """
+    remove shared value if it is released by the creator and not held by any view; returns True if removed
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        header = os.pread(fd, 8, 0)
+
+        if len(header) < 8:
+            # should not happen: values are renamed into place when written
+            logger.warning("shared value %s has no header, leaving it", path)
+            return False
+
+        released = struct.unpack("q", header)[0] == 1
+
+        if released:
+            logger.info("removing unused shared value %s", path)
+            os.unlink(path)
+
+        return released
+    finally:
+        os.close(fd)
+
+
+def _release_view(fd, path):
+    os.close(fd)
+    _remove_if_unused(path)
+
+
+def sweep_shared_values(directory=None):
+    """
+    remove released shared values left behind, e.g. when the last view holder was killed
+    """
+    n = 0
+    for path in shared_value_dir(directory).glob("*.shm"):
+        n += _remove_if_unused(path)
+
+    return n
+
+
+def _maybe_sweep_shared_values(directory=None):
+    directory = shared_value_dir(directory)
+
+    with _sweep_lock:
+        if time.monotonic() - _last_sweep.get(directory, -sweep_interval) < sweep_interval:
+            return
+
+        _last_sweep[directory] = time.monotonic()
+
+    sweep_shared_values(directory)
+
+
+class SharedValueRef:
+    """
+    picklable reference to a value in shared memory
+    """
+
+    def __init__(self, path, format, shape, nbytes, dtype=None) -> None:
+        self.path = str(path)
+        self.format = format
+        self.shape = tuple(shape)
+        self.nbytes = nbytes
+        self.dtype = dtype
+
+    def __repr__(self) -> str:
+        return f"[{self.__class__.__name__}: {self.path} {self.dtype or self.format}{list(self.shape)}]"
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def attach(self):
+        """
+        zero-copy read-only view of the value: numpy array if the value was an array, else memoryview.
+        the view holds the value until the view and all views derived from it are gone
+        """
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            raise RuntimeError(f"shared value {self} was released, and can not be attached")
+
+        fcntl.flock(fd, fcntl.LOCK_SH)
+
+        m = mmap.mmap(fd, header_size + self.nbytes, access=mmap.ACCESS_READ)
+        weakref.finalize(m, _release_view, fd, self.path)
+
+        if self.dtype is not None:
+            try:
+                import numpy as np
+            except ImportError:
+                logger.warning("numpy is not available, shared array %s is attached as memoryview", self)
+            else:
+                return np.frombuffer(m, dtype=self.dtype, count=int(np.prod(self.shape, dtype=int)), offset=header_size).reshape(self.shape)
+
+        return memoryview(m)[header_size:header_size + self.nbytes].cast(self.format, self.shape)
+
+    def release(self):
+        """
+        give up the value by its creator, or by whom the creator passed it to: it is removed as soon as no view holds it
+        """
+        try:
+            _mark_released(self.path)
+        except FileNotFoundError:
+            logger.warning("shared value %s is already gone", self)
+            return True
+
+        return _remove_if_unused(self.path)
+
+
+def share_value(value, directory=None) -> SharedValueRef:
+    """
+    copy buffer value to shared memory once; it stays there until the returned reference is released
+    """
+    mv = memoryview(value)
+
+    _maybe_sweep_shared_values(directory)
+
+    name = uuid.uuid4().hex
+    path = shared_value_dir(directory) / f"{name}.shm"
+    # written under a name which sweeps do not see, and renamed into place when complete
+    tmp_path = path.with_name(f".{name}.tmp")
+
+    with open(tmp_path, "wb") as f:
+        # header holds released flag
+        f.write(struct.pack("q", 0).ljust(header_size, b"\0"))
+
+        if mv.c_contiguous:
+            f.write(mv)
+        else:
+            f.write(mv.tobytes())
+
+    os.rename(tmp_path, path)
+
+    dtype = getattr(value, 'dtype', None)
+    ref = SharedValueRef(path, mv.format, mv.shape, mv.nbytes, dtype=None if dtype is None else dtype.str)
+
+    logger.info("shared %s as %s", repr_trim(value), ref)
+    return ref
+
+
+class SharedLocalValue(LocalValue):
+    """
+    local value with payload in shared memory: pickled, e.g. to a pool worker, as a reference only
+
+    creator of the value holds a reference until release(); every process attaches on first access to value
+    """
+
+    def __init__(self, ref: SharedValueRef, provenance=None) -> None:
+        super().__init__(None, provenance)
+        self.ref = ref
+
+    @classmethod
+    def from_value(cls, value, provenance=None, directory=None):
+        if isinstance(value, LocalValue):
+            value, provenance = value.value, value.provenance
+
+        return cls(share_value(value, directory), provenance)
+
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = self.ref.attach()
+
+        return self._value
+
+    def release(self):
+        return self.ref.release()
+
+    def __getstate__(self):
+        return {'ref': self.ref, '_provenance': self._provenance, '_value': None}
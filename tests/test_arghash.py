@@ -0,0 +1,115 @@
+import hashlib
+import json
+
+import pytest
+
+from odafunction import LocalPythonFunction
+from odafunction.arghash import argument_digest, register_argument_hasher, argument_hashers
+from odafunction.executors import default_execute_to_value
+from odafunction.func.urifunc import URIPythonFunction
+
+np = pytest.importorskip("numpy")
+
+
+def test_digest_json_compatible():
+    # same as digest of plain json, so that URIs do not change
+    for value in [[(('args', (1, 2, 3)), ('kwargs', {}))], {"a": [1.5, "x", None, True]}, list(range(10000))]:
+        assert argument_digest(value) == hashlib.md5(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+    assert argument_digest({"a": 1, "b": 2}) == argument_digest({"b": 2, "a": 1})
+
+
+def test_digest_buffers():
+    a = np.arange(100000, dtype=float)
+
+    assert argument_digest(a) == argument_digest(a.copy())
+    assert argument_digest(a) != argument_digest(a.astype(np.float32))
+    assert argument_digest(a) != argument_digest(a.reshape(1000, 100))
+    assert argument_digest(a[::2]) == argument_digest(a[::2].copy())
+
+    assert argument_digest(np.int64(3)) == argument_digest(3)
+
+    assert argument_digest(b"x" * 1000) != argument_digest(b"y" * 1000)
+    assert argument_digest(b"x") == argument_digest(bytearray(b"x"))
+
+
+def test_digest_registered_type():
+    class Position:
+        def __init__(self, ra, dec):
+            self.ra, self.dec = ra, dec
+
+    with pytest.raises(TypeError):
+        argument_digest(Position(1, 2))
+
+    register_argument_hasher(Position, lambda p: {'ra': p.ra, 'dec': p.dec})
+
+    try:
+        assert argument_digest(Position(1, 2)) == argument_digest(Position(1, 2))
+        assert argument_digest(Position(1, 2)) != argument_digest(Position(1, 3))
+    finally:
+        del argument_hashers[Position]
+
+
+def make_scaled(k):
+    return lambda x: x * k
+
+
+def read_attribute(a):
+    return a.x
+
+
+def read_other_attribute(a):
+    return a.y
+
+
+def test_digest_functions():
+    assert argument_digest(make_scaled(2)) == argument_digest(make_scaled(2))
+    assert argument_digest(make_scaled(2)) != argument_digest(make_scaled(3))
+
+    # same bytecode, other names
+    assert read_attribute.__code__.co_code == read_other_attribute.__code__.co_code
+    assert argument_digest(read_attribute) != argument_digest(read_other_attribute)
+
+    # same code reading other globals
+    namespace_a, namespace_b = {'K': 1}, {'K': 2}
+    exec("def f(x):\n    return x + K\n", namespace_a)
+    exec("def f(x):\n    return x + K\n", namespace_b)
+    assert argument_digest(namespace_a['f']) != argument_digest(namespace_b['f'])
+
+    namespace_b['K'] = 1
+    assert argument_digest(namespace_a['f']) == argument_digest(namespace_b['f'])
+
+    # recursive functions are hashed
+    exec("def g(n):\n    return 1 if n == 0 else n * g(n - 1)\n", namespace_a)
+    assert argument_digest(namespace_a['g']) == argument_digest(namespace_a['g'])
+
+
+def test_partial_application_with_arrays():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    a = np.ones(1000)
+    f1 = f_add(a, a, 1)
+    f2 = f_add(a.copy(), a, 1)
+    f3 = f_add(a * 2, a, 1)
+
+    assert f1.uri == f2.uri
+    assert f1.uri != f3.uri
+
+    assert (default_execute_to_value(f1) == 3).all()
+
+    # nested functions are hashed by their URI
+    assert f_add(f_add(1, 2, 3), 1, 2).uri != f_add(f_add(1, 2, 4), 1, 2).uri
+
+
+def test_memoize_array_arguments():
+    calls = []
+
+    def total(a):
+        calls.append(a)
+        return float(a.sum())
+
+    f = LocalPythonFunction(total, memoize=True)
+
+    assert default_execute_to_value(f(np.arange(10))) == 45
+    assert default_execute_to_value(f(np.arange(10))) == 45
+    assert len(calls) == 1
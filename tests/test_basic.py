@@ -194,7 +194,7 @@ def test_caching_uri():
         memory.seek(0)
         print("\033[31m{memory.name}\033[0m", memory.read())
 
-        assert len(ex.memory_graph) == 1
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 1
 
     
 
@@ -233,6 +233,6 @@ def test_uri_revisions(caplog):
 
     assert 'loaded from cache' in caplog.text
 
-    assert len(ex.memory_graph) == 1
+    assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 1
 
     print(ex.memory_graph.serialize(format='turtle'))
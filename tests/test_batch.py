@@ -0,0 +1,98 @@
+import json
+import logging
+import tempfile
+import threading
+
+from click.testing import CliRunner
+
+from odafunction.cli import main
+from odafunction.executors import LocalURICachingExecutor
+from odafunction.executors.batch import BatchRunner
+from odafunction.func.urifunc import URIFunction
+
+
+def test_batch_runner():
+    requests = [{"uri": "file://tests/test_data/filewithfunc.py::examplefunc", "args": [i, 2], "kwargs": {"z": 3}} for i in range(20)]
+    requests.append({"uri": "file://tests/test_data/filewithfunc.py::nosuchfunc", "args": []})
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+        results = list(BatchRunner(parallel=4, caching_executor=ex).run(requests))
+
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 20
+
+        # all in the persisted cache, despite concurrent writes
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 20
+
+    by_id = {r['id']: r for r in results}
+    assert [by_id[i]['value'] for i in range(20)] == [i + 5 for i in range(20)]
+    assert 'AttributeError' in by_id[20]['error']
+
+
+def test_batch_runner_loads_functions_independently(monkeypatch):
+    slow_uri = "file://tests/test_data/filewithfunc.py::slow"
+    uri = "file://tests/test_data/filewithfunc.py::examplefunc"
+
+    from_uri = URIFunction.from_uri
+    loading = threading.Event()
+    release = threading.Event()
+    n_loads = []
+
+    def blocking_from_uri(u):
+        n_loads.append(u)
+
+        if u == slow_uri:
+            loading.set()
+            release.wait(5)
+            return from_uri(uri)
+
+        return from_uri(u)
+
+    monkeypatch.setattr(URIFunction, "from_uri", blocking_from_uri)
+
+    runner = BatchRunner(cached=False)
+
+    slow = [threading.Thread(target=runner.function, args=(slow_uri,)) for _ in range(2)]
+    for t in slow: t.start()
+    loading.wait(5)
+
+    # other functions are loaded while the slow one is still loading
+    t = threading.Thread(target=runner.function, args=(uri,))
+    t.start()
+    t.join(2)
+    assert not t.is_alive()
+
+    release.set()
+    for t in slow: t.join()
+
+    # and the slow one was loaded once
+    assert n_loads.count(slow_uri) == 1
+    assert sorted(runner.loaded_functions) == sorted([slow_uri, uri])
+
+
+def test_run_many_cli():
+    lines = "\n".join(json.dumps({"uri": "file://tests/test_data/filewithfunc.py::examplefunc", "args": [i, 2, 3], "id": f"r{i}"}) for i in range(3))
+
+    result = CliRunner().invoke(main, ["run-many", "-nc", "-j", "2"], input=lines + "\n")
+    assert result.exit_code == 0, result.output
+
+    # log lines may be mixed in the captured output
+    results = [json.loads(line) for line in result.output.splitlines() if line.startswith("{")]
+    assert sorted((r['id'], r['value']) for r in results) == [("r0", 5), ("r1", 6), ("r2", 7)]
+
+
+def test_cli_logging_restored():
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    levels = (root.level, logging.getLogger("odafunction").level)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(f"{tmpdir}/requests.jsonl", "w") as f:
+            f.write(json.dumps({"uri": "file://tests/test_data/filewithfunc.py::examplefunc", "args": [1, 2]}) + "\n")
+
+        result = CliRunner().invoke(main, ["-v", "run-many", f"{tmpdir}/requests.jsonl", "-nc"])
+        assert result.exit_code == 0, result.output
+
+    assert root.handlers == handlers
+    assert (root.level, logging.getLogger("odafunction").level) == levels
@@ -0,0 +1,339 @@
+import os
+import tempfile
+import threading
+
+import pytest
+import rdflib
+
+from odafunction.executors import LocalURICachingExecutor
+from odafunction.executors.cachetiers import CacheTier, portable_key, odaf_ontology
+from odafunction.func.urifunc import URIPythonFunction, function_revisions, source_content_hash
+
+
+def write_func(path, body):
+    with open(path, "w") as f:
+        f.write(f"def examplefunc(x):\n    return {body}\n")
+
+    # make sure the change is visible even on filesystems with coarse mtime
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_content_revision():
+    f = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    assert f.content_revision == source_content_hash("tests/test_data/filewithfunc.py")
+    assert function_revisions(f(1, 2, 3)) == {"file://tests/test_data/filewithfunc.py::examplefunc": f.content_revision}
+
+
+def test_cache_invalidated_on_edit():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        func_path = f"{tmpdir}/func.py"
+        write_func(func_path, "x + 1")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+        assert ex(f(1)).value == 2
+        assert ex(f(1)).value == 2
+
+        write_func(func_path, "x + 100")
+
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+        assert ex(f(1)).value == 101
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 1
+
+
+def test_cache_targeted_invalidation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_func(f"{tmpdir}/func_a.py", "x + 1")
+        write_func(f"{tmpdir}/func_b.py", "x + 2")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+
+        f_a = URIPythonFunction(f"file://{tmpdir}/func_a.py::examplefunc")
+        f_b = URIPythonFunction(f"file://{tmpdir}/func_b.py::examplefunc")
+
+        ex(f_a(1))
+        ex(f_b(1))
+        ex(f_a(2))
+
+        assert ex.invalidate_stale() == 0
+
+        write_func(f"{tmpdir}/func_a.py", "x + 10")
+
+        # result of f_b does not depend on f_a and remains
+        assert ex.invalidate_stale() == 2
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 1
+
+        assert ex.invalidate(f"file://{tmpdir}/func_b.py::examplefunc") == 1
+        assert len(ex.memory_graph) == 0
+
+
+def test_cache_tiers():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # one user computes, and publishes to the shared tier
+        ex_a = LocalURICachingExecutor(f"{tmpdir}/memory-a.ttl", tiers=[f"{tmpdir}/shared:rw"])
+        assert ex_a(f_add(1, 2, 30)).value == 33
+
+        shared = CacheTier(f"{tmpdir}/shared")
+        assert shared.keys() == [portable_key(f_add(1, 2, 30).uri)]
+
+        # another finds it in read-only shared tier, and promotes it to local
+        ex_b = LocalURICachingExecutor(f"{tmpdir}/memory-b.ttl", tiers=[shared])
+        r = ex_b(f_add(1, 2, 30))
+        assert r.value == 33
+        assert "promoted" in r.uri
+        assert len(list(ex_b.memory_graph.triples((None, ex_b.uri, None)))) == 1
+
+        with pytest.raises(RuntimeError):
+            shared.publish([("urivalue://x", 1, {})])
+
+
+def test_cache_tier_concurrent_publish():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def publish(i):
+            tier = CacheTier(f"{tmpdir}/shared", writable=True)
+            for j in range(5):
+                tier.publish([(f"urivalue://x-{i}-{j}", i * j, {})])
+
+        threads = [threading.Thread(target=publish, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        shared = CacheTier(f"{tmpdir}/shared")
+        assert len(shared.keys()) == 20
+        assert shared.lookup("urivalue://x-3-4") == (True, 12)
+        assert not shared.lock_path.exists()
+
+
+def test_cache_tier_stale_lock():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tier = CacheTier(f"{tmpdir}/shared", writable=True)
+        tier.lock_timeout = 0.2
+
+        tier.path.mkdir()
+        tier.lock_path.write_text("publisher which died")
+
+        with pytest.raises(RuntimeError):
+            tier.publish([("urivalue://x", 1, {})])
+
+        tier.stale_lock_time = 0
+        assert tier.publish([("urivalue://x", 1, {})]) == 1
+
+
+def test_cache_tier_fresh_lock_not_broken(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tier = CacheTier(f"{tmpdir}/shared", writable=True)
+        tier.stale_lock_time = 0
+
+        tier.path.mkdir()
+        tier.lock_path.write_text("publisher which died")
+
+        lock_owner = tier._lock_owner
+
+        def taken_meanwhile(path=None):
+            owner = lock_owner(path)
+
+            if path is None:
+                # stale lock is released, and another publisher takes a new one, after it was found stale
+                tier.lock_path.write_text("another publisher")
+
+            return owner
+
+        monkeypatch.setattr(tier, "_lock_owner", taken_meanwhile)
+
+        tier._break_stale_lock()
+
+        assert tier.lock_path.read_text() == "another publisher"
+        assert [p.name for p in tier.path.iterdir()] == [tier.lock_path.name]
+
+
+def test_cache_tier_stored_at_outside():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tier = CacheTier(f"{tmpdir}/shared", writable=True)
+        tier.publish([("urivalue://x", 1, {})])
+
+        with open(f"{tmpdir}/secret.json", "w") as f:
+            f.write("2")
+
+        for stored_at in ["../secret.json", f"{tmpdir}/secret.json"]:
+            graph = tier.graph
+            graph.set((tier.value_node("urivalue://x"), odaf_ontology.storedAt, rdflib.Literal(stored_at)))
+            tier.graph_path.write_text(graph.serialize(format="turtle"))
+
+            assert tier.lookup("urivalue://x") == (False, None)
+
+
+def test_cache_export_import():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex_a = LocalURICachingExecutor(f"{tmpdir}/memory-a.ttl", tiers=[])
+        ex_a(f_add(1, 2, 40))
+        ex_a(f_add(1, 2, 41))
+
+        assert ex_a.export_tier(CacheTier(f"{tmpdir}/shared", writable=True), match="") == 2
+
+        ex_b = LocalURICachingExecutor(f"{tmpdir}/memory-b.ttl", tiers=[])
+        assert ex_b.import_tier(CacheTier(f"{tmpdir}/shared")) == 2
+        assert ex_b(f_add(1, 2, 41)).value == 44
+
+
+def test_cache_lookup_many():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        func_path = f"{tmpdir}/func.py"
+        write_func(func_path, "x + 1")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+
+        for x in range(3):
+            ex(f(x))
+
+        found = ex.lookup_many([f(x) for x in range(5)])
+
+        assert [found[f(x).uri] is not None for x in range(5)] == [True, True, True, False, False]
+        assert found[f(1).uri] == ex.lookup(f(1))
+
+        write_func(func_path, "x + 100")
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+
+        assert set(ex.lookup_many([f(x) for x in range(3)]).values()) == {None}
+
+
+def test_cache_transaction(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        func_path = f"{tmpdir}/func.py"
+        write_func(func_path, "x + 1")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+
+        saves = []
+        save_cache = ex.save_cache
+        monkeypatch.setattr(ex, "save_cache", lambda durable=False: saves.append(durable) or save_cache(durable))
+
+        with ex.transaction():
+            with ex.transaction():
+                for x in range(5):
+                    assert ex(f(x)).value == x + 1
+
+            assert saves == []
+
+        assert saves == [True]
+
+        # flushed entries are visible to another executor
+        assert LocalURICachingExecutor(f"{tmpdir}/memory.ttl").lookup(f(4)) is not None
+
+
+def test_cache_flush_every(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        func_path = f"{tmpdir}/func.py"
+        write_func(func_path, "x + 1")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+        ex.flush_every = 3
+
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+
+        saves = []
+        save_cache = ex.save_cache
+        monkeypatch.setattr(ex, "save_cache", lambda durable=False: saves.append(durable) or save_cache(durable))
+
+        for x in range(7):
+            ex(f(x))
+
+        assert saves == [False, False]
+        assert LocalURICachingExecutor(f"{tmpdir}/memory.ttl").lookup(f(6)) is None
+
+        ex.flush()
+
+        assert saves == [False, False, True]
+        assert LocalURICachingExecutor(f"{tmpdir}/memory.ttl").lookup(f(6)) is not None
+
+
+def test_content_revision_of_loaded_source():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        func_path = f"{tmpdir}/func.py"
+        write_func(func_path, "x + 1")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+
+        f_old = URIPythonFunction(f"file://{func_path}::examplefunc")
+        revision = f_old.content_revision
+
+        # source changes after the function was loaded, e.g. in a long-running daemon
+        write_func(func_path, "x + 100")
+
+        assert f_old.content_revision == revision
+        assert ex(f_old(1)).value == 2
+
+        f_new = URIPythonFunction(f"file://{func_path}::examplefunc")
+        assert f_new.content_revision != revision
+        assert ex(f_new(1)).value == 101
+
+
+def test_cache_publish_outside_lock(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        func_path = f"{tmpdir}/func.py"
+        write_func(func_path, "x + 1")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[f"{tmpdir}/shared:rw"])
+        f = URIPythonFunction(f"file://{func_path}::examplefunc")
+
+        tier = ex.tiers[0]
+        publish = tier.publish
+        lock_free = []
+
+        def checked_publish(entries):
+            # another thread can use the executor while values are published
+            t = threading.Thread(target=lambda: lock_free.append(ex._lock.acquire(timeout=5) and ex._lock.release() is None))
+            t.start()
+            t.join()
+            return publish(entries)
+
+        monkeypatch.setattr(tier, "publish", checked_publish)
+
+        with ex.transaction():
+            for x in range(3):
+                r = ex(f(x))
+
+            # only locations of values wait for publishing
+            assert [value_uri for _, value_uri, _ in ex._pending_publish][-1] == r.uri
+
+        assert lock_free == [True]
+        assert sorted(tier.lookup(portable_key(f(x).uri))[1] for x in range(3)) == [1, 2, 3]
+
+        # changes saved at once publish after the lock is released, too
+        ex(f(10))
+        assert lock_free == [True, True]
+        assert tier.lookup(portable_key(f(10).uri)) == (True, 11)
+
+
+def test_cache_tier_lookup_outside_lock(monkeypatch):
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        LocalURICachingExecutor(f"{tmpdir}/memory-a.ttl", tiers=[f"{tmpdir}/shared:rw"])(f_add(1, 2, 30))
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory-b.ttl", tiers=[f"{tmpdir}/shared"])
+
+        tier = ex.tiers[0]
+        lookup = tier.lookup
+        lock_free = []
+
+        def checked_lookup(*args):
+            t = threading.Thread(target=lambda: lock_free.append(ex._lock.acquire(timeout=5) and ex._lock.release() is None))
+            t.start()
+            t.join()
+            return lookup(*args)
+
+        monkeypatch.setattr(tier, "lookup", checked_lookup)
+
+        assert ex(f_add(1, 2, 30)).value == 33
+        assert lock_free == [True]
@@ -0,0 +1,53 @@
+import tempfile
+
+from odafunction.catalogviews import FunctionCatalogKeyedLocalValued, FunctionCatalogKeyedLocalValuedAttrs
+from odafunction.executors import default_execute_to_value
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def test_catalog_snapshot_lazy():
+    fc = FunctionCatalogKeyedLocalValued()
+    fc.add("examplefunc", URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc"))
+    fc.add_uri("examplefunc_lazy", "file://tests/test_data/filewithfunc.py::examplefunc", {"description": "adds numbers"})
+
+    with tempfile.NamedTemporaryFile(suffix=".json") as snapshot:
+        fc.dump_snapshot(snapshot.name)
+
+        fc_loaded = FunctionCatalogKeyedLocalValuedAttrs.from_snapshot(snapshot.name)
+
+    assert fc_loaded.keys() == ["examplefunc", "examplefunc_lazy"]
+    assert fc_loaded.metadata["examplefunc_lazy"] == {"description": "adds numbers"}
+    assert not fc_loaded.is_materialized("examplefunc")
+
+    assert default_execute_to_value(fc_loaded.find("examplefunc")(1, 2, 3)) == 6
+    assert fc_loaded.is_materialized("examplefunc")
+    assert not fc_loaded.is_materialized("examplefunc_lazy")
+
+
+def test_catalog_snapshot_prefetch():
+    fc = FunctionCatalogKeyedLocalValued()
+    fc.add_uri("examplefunc", "file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.NamedTemporaryFile(suffix=".json") as snapshot:
+        fc.dump_snapshot(snapshot.name)
+        fc_loaded = FunctionCatalogKeyedLocalValued.from_snapshot(snapshot.name)
+
+    futures = fc_loaded.prefetch(wait=True)
+
+    assert isinstance(futures["examplefunc"].result(), URIPythonFunction)
+    assert fc_loaded.is_materialized("examplefunc")
+
+
+def test_catalog_snapshot_replaced():
+    fc = FunctionCatalogKeyedLocalValued()
+    fc.add_uri("examplefunc", "file://tests/test_data/otherfile.py::examplefunc", {"key": "k", "uri": "u"})
+    fc.add("examplefunc", URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc"))
+
+    assert fc.metadata["examplefunc"] == {"key": "k", "uri": "u"}
+
+    with tempfile.NamedTemporaryFile(suffix=".json") as snapshot:
+        fc.dump_snapshot(snapshot.name)
+        fc_loaded = FunctionCatalogKeyedLocalValued.from_snapshot(snapshot.name)
+
+    assert fc_loaded.uris["examplefunc"] == "file://tests/test_data/filewithfunc.py::examplefunc"
+    assert fc_loaded.metadata["examplefunc"] == {"key": "k", "uri": "u"}
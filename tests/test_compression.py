@@ -0,0 +1,44 @@
+import tempfile
+
+import pytest
+
+from odafunction.compression import detect_codec
+from odafunction.executors import LocalURICachingExecutor
+from odafunction.func.urifunc import URIPythonFunction, URIValue
+
+
+@pytest.mark.parametrize("codec,expected", [("fast", "gzip"), ("dense", "xz"), ("none", None)])
+def test_urivalue_compression(codec, expected, monkeypatch):
+    monkeypatch.setenv("ODAFUNCTION_COMPRESSION", codec)
+    monkeypatch.setenv("ODAFUNCTION_COMPRESSION_THRESHOLD", "100")
+
+    value = ["115900920010.001"] * 1000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        URIValue(f"file://{tmpdir}/large.data", value=value)
+        URIValue(f"file://{tmpdir}/small.data", value="blababla")
+
+        assert detect_codec(f"{tmpdir}/large.data") == expected
+        assert detect_codec(f"{tmpdir}/small.data") is None
+
+        # reading does not depend on configuration
+        monkeypatch.delenv("ODAFUNCTION_COMPRESSION")
+
+        assert URIValue(f"file://{tmpdir}/large.data").value == value
+        assert URIValue(f"file://{tmpdir}/small.data").value == "blababla"
+
+
+def test_memory_graph_compression(monkeypatch):
+    monkeypatch.setenv("ODAFUNCTION_COMPRESSION", "fast")
+    monkeypatch.setenv("ODAFUNCTION_COMPRESSION_THRESHOLD", "0")
+
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+        ex(f_add(1, 2, 3))
+
+        assert detect_codec(f"{tmpdir}/memory.ttl") == "gzip"
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl")
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 1
@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from odafunction import LocalPythonFunction
+from odafunction.context import current_execution_context, execution_context
+from odafunction.executors import default_execute_to_value
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def test_execution_context_nesting():
+    assert current_execution_context().cached is None
+
+    with execution_context(cached=True, trace=[]) as outer:
+        with execution_context(cached=False) as inner:
+            assert inner.cached is False
+            assert inner.trace is outer.trace
+
+        assert current_execution_context().cached is True
+
+    assert current_execution_context().cached is None
+
+
+def test_nested_execution_inherits_context():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+    increment = LocalPythonFunction(lambda x: x + 1)
+
+    seen_cached = []
+
+    def record_context(x):
+        seen_cached.append(current_execution_context().cached)
+        return x
+
+    fg = increment(LocalPythonFunction(record_context)(f_add(1, 2, 3)))
+
+    with execution_context(cached=True, trace=[]) as context:
+        assert default_execute_to_value(fg) == 7
+
+    assert seen_cached == [True]
+
+    # innermost function has URI, and was executed cached; the others were not
+    assert [(t['depth'], t['cached']) for t in context.trace] == [(2, True), (1, False), (0, False)]
+
+
+def test_nested_execution_pool():
+    slow = LocalPythonFunction(lambda x: time.sleep(0.2) or threading.current_thread().name)
+    collect = LocalPythonFunction(lambda *names: names)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        with execution_context(pool=pool):
+            t0 = time.time()
+            names = default_execute_to_value(collect(slow(1), slow(2), slow(3)))
+
+    assert time.time() - t0 < 0.5
+    assert len(set(names)) == 3
+    assert all(name != threading.current_thread().name for name in names)
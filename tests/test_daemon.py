@@ -0,0 +1,142 @@
+import os
+import stat
+import tempfile
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from odafunction.cli import main
+from odafunction.daemon import OdafunctionDaemon, DaemonClient
+from odafunction.executors import LocalURICachingExecutor
+from odafunction.executors.batch import BatchRunner
+
+
+def start(daemon):
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_daemon_unix_socket():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(f"{tmpdir}/func.py", "w") as f:
+            f.write("def f(x):\n    return x + 1\n")
+
+        runner = BatchRunner(caching_executor=LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[]))
+        daemon = OdafunctionDaemon(socket_path=f"{tmpdir}/daemon.sock", runner=runner)
+        thread = start(daemon)
+
+        client = DaemonClient(daemon.address)
+        uri = f"file://{tmpdir}/func.py::f"
+
+        # concurrent requests
+        results = {}
+        threads = [threading.Thread(target=lambda i=i: results.update({i: client.run(uri, [i], cached=False)['value']})) for i in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        assert results == {i: i + 1 for i in range(8)}
+        assert list(client.status()['functions']) == [uri]
+
+        assert 'value_uri' in client.run(uri, [1], urivalue=True)
+
+        # source changes: function is loaded again, and cache entry is stale
+        time.sleep(0.01)
+        with open(f"{tmpdir}/func.py", "w") as f:
+            f.write("def f(x):\n    return x + 100\n")
+
+        assert client.run(uri, [1], cached=False)['value'] == 101
+        assert client.run(uri, [1])['value'] == 101
+
+        with pytest.raises(RuntimeError):
+            client.run(f"file://{tmpdir}/func.py::nosuchfunc")
+
+        assert client.status()['n_requests'] == 12
+
+        client.shutdown()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert not client.alive()
+
+
+def test_daemon_reload_keeps_unsaved():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(f"{tmpdir}/func.py", "w") as f:
+            f.write("def f(x):\n    return x + 1\n")
+
+        caching_executor = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+        caching_executor.flush_every = 100
+
+        daemon = OdafunctionDaemon(socket_path=f"{tmpdir}/daemon.sock", runner=BatchRunner(caching_executor=caching_executor))
+        thread = start(daemon)
+
+        client = DaemonClient(daemon.address)
+        uri = f"file://{tmpdir}/func.py::f"
+
+        assert client.run(uri, [1])['value'] == 2
+        assert len(list(caching_executor.memory_graph.triples((None, caching_executor.uri, None)))) == 1
+
+        client.reload()
+
+        assert len(list(caching_executor.memory_graph.triples((None, caching_executor.uri, None)))) == 1
+
+        client.shutdown()
+        thread.join(5)
+
+        saved = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+        assert len(list(saved.memory_graph.triples((None, saved.uri, None)))) == 1
+
+
+def test_daemon_http():
+    daemon = OdafunctionDaemon(host="127.0.0.1", port=0, runner=BatchRunner(cached=False))
+    thread = start(daemon)
+
+    # any local user can connect to loopback: token is generated
+    assert daemon.token is not None
+
+    with pytest.raises(RuntimeError, match="401"):
+        DaemonClient(daemon.address, token="").status()
+
+    client = DaemonClient(daemon.address, token=daemon.token)
+    assert client.run("file://tests/test_data/filewithfunc.py::examplefunc", [1, 2], {"z": 3})['value'] == 6
+
+    client.shutdown()
+    thread.join(5)
+
+
+def test_daemon_socket_private():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        daemon = OdafunctionDaemon(socket_path=f"{tmpdir}/daemon.sock", runner=BatchRunner(cached=False))
+
+        assert stat.S_IMODE(os.stat(f"{tmpdir}/daemon.sock").st_mode) == 0o600
+
+        daemon.close()
+
+
+def test_daemon_token():
+    daemon = OdafunctionDaemon(host="0.0.0.0", port=0, runner=BatchRunner(cached=False), token="secret")
+    thread = start(daemon)
+
+    address = daemon.address.replace("0.0.0.0", "127.0.0.1")
+
+    with pytest.raises(RuntimeError, match="401"):
+        DaemonClient(address).status()
+
+    with pytest.raises(RuntimeError, match="401"):
+        DaemonClient(address, token="guess").run("file://tests/test_data/filewithfunc.py::examplefunc", [1, 2])
+
+    client = DaemonClient(address, token="secret")
+    assert client.run("file://tests/test_data/filewithfunc.py::examplefunc", [1, 2], {"z": 3})['value'] == 6
+
+    client.shutdown()
+    thread.join(5)
+
+
+def test_run_daemon_unsupported_options():
+    result = CliRunner().invoke(main, ["run", "file://tests/test_data/filewithfunc.py::examplefunc", "--daemon", "unix:/nonexistent.sock", "--plan"])
+
+    assert result.exit_code == 2
+    assert "--plan can not be used with --daemon" in result.output
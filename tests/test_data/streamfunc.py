@@ -0,0 +1,3 @@
+def count_items(n):
+    for i in range(n):
+        yield {"i": i, "square": i * i}
@@ -0,0 +1,77 @@
+import tempfile
+import time
+
+from odafunction.executors import LocalURICachingExecutor
+from odafunction.executors.cachetiers import odaf_ontology
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def write(path, source):
+    # mtime resolution may hide quick changes of the same size
+    time.sleep(0.01)
+    with open(path, "w") as f:
+        f.write(source)
+
+
+def test_early_cutoff():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write(f"{tmpdir}/up.py", "def up(x):\n    return x % 2\n")
+        write(f"{tmpdir}/down.py", "calls = []\n\ndef down(y):\n    calls.append(y)\n    return y * 10\n")
+
+        f_down = URIPythonFunction(f"file://{tmpdir}/down.py::down")
+        calls = f_down.local_python_function.__globals__['calls']
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+
+        def run():
+            f_up = URIPythonFunction(f"file://{tmpdir}/up.py::up")
+            return ex(f_down(f_up(3))).value
+
+        assert run() == 10
+        assert run() == 10
+        assert calls == [1]
+
+        # intermediate and final values
+        assert len(list(ex.memory_graph.subject_objects(odaf_ontology.contentDigest))) == 2
+        assert len(list(ex.memory_graph.subject_objects(odaf_ontology.inputDigest))) == 1
+
+        # upstream changed, but computes the same intermediate value: downstream is not computed again
+        write(f"{tmpdir}/up.py", "def up(x):\n    # changed\n    return x % 2\n")
+        assert run() == 10
+        assert calls == [1]
+
+        # and still valid for the new revision
+        assert run() == 10
+        assert calls == [1]
+
+        # intermediate value changed
+        write(f"{tmpdir}/up.py", "def up(x):\n    return x % 2 + 1\n")
+        assert run() == 20
+        assert calls == [1, 2]
+
+
+
+def test_early_cutoff_reuses_recorded_digests(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write(f"{tmpdir}/up.py", "def up(x):\n    return x % 2\n")
+        write(f"{tmpdir}/down.py", "def down(y):\n    return y * 10\n")
+
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+
+        def run():
+            f_up = URIPythonFunction(f"file://{tmpdir}/up.py::up")
+            f_down = URIPythonFunction(f"file://{tmpdir}/down.py::down")
+            return ex(f_down(f_up(3))).value
+
+        assert run() == 10
+
+        import odafunction.executors
+
+        digested = []
+        content_digest = odafunction.executors.content_digest
+        monkeypatch.setattr(odafunction.executors, "content_digest", lambda value: digested.append(value) or content_digest(value))
+
+        # downstream changed: intermediate value is loaded from cache, its digest is read from the graph
+        write(f"{tmpdir}/down.py", "def down(y):\n    # changed\n    return y * 10\n")
+        assert run() == 10
+        assert digested == [10]
@@ -0,0 +1,90 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from odafunction import LocalPythonFunction
+from odafunction.context import execution_context
+from odafunction.executors import LocalURICachingExecutor, default_execute_to_value
+from odafunction.executors.fusion import execute_fused, fusion_key
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def test_fusion_local():
+    batch_sizes = []
+
+    def double_batched(x):
+        batch_sizes.append(len(x))
+        return [2 * xi for xi in x]
+
+    double = LocalPythonFunction(lambda x: 2 * x, batched=double_batched)
+    add = LocalPythonFunction(lambda a, b, c: a + b + c)
+
+    assert fusion_key(double(1)) == fusion_key(double(2))
+    assert fusion_key(add(1, 2, 3)) is None
+
+    assert execute_fused([double(i) for i in range(5)] + [add(1, 2, 3)]) == [0, 2, 4, 6, 8, 6]
+    assert batch_sizes == [5]
+
+    # nested calls are fused when arguments are evaluated
+    assert default_execute_to_value(add(double(1), double(2), c=double(3))) == 12
+    assert batch_sizes == [5, 3]
+
+
+def test_fusion_cached():
+    square = URIPythonFunction("file://tests/test_data/batchedfunc.py::square")
+    batch_sizes = square.local_python_function.__globals__['batch_sizes']
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+
+        funcs = [square(i, offset=1) for i in range(4)]
+        assert execute_fused(funcs, cached=True, caching_executor=ex) == [1, 2, 5, 10]
+        assert batch_sizes == [4]
+
+        # each call has own cache entry
+        assert len(list(ex.memory_graph.triples((None, ex.uri, None)))) == 4
+        assert len({str(ex.lookup(f)) for f in funcs}) == 4
+
+        # only calls not in cache are computed
+        funcs = [square(i, offset=1) for i in range(6)]
+        assert execute_fused(funcs, cached=True, caching_executor=ex) == [1, 2, 5, 10, 17, 26]
+        assert batch_sizes == [4, 2]
+
+
+def test_fusion_cached_in_tier():
+    square = URIPythonFunction("file://tests/test_data/batchedfunc.py::square")
+    batch_sizes = square.local_python_function.__globals__['batch_sizes']
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex_a = LocalURICachingExecutor(f"{tmpdir}/memory-a.ttl", tiers=[f"{tmpdir}/shared:rw"])
+        assert execute_fused([square(i, offset=2) for i in range(4)], cached=True, caching_executor=ex_a) == [2, 3, 6, 11]
+
+        del batch_sizes[:]
+
+        # another user finds computed calls in the shared tier
+        ex_b = LocalURICachingExecutor(f"{tmpdir}/memory-b.ttl", tiers=[f"{tmpdir}/shared"])
+        assert execute_fused([square(i, offset=2) for i in range(6)], cached=True, caching_executor=ex_b) == [2, 3, 6, 11, 18, 27]
+        assert batch_sizes == [2]
+
+        assert all(ex_b.lookup(square(i, offset=2)) is not None for i in range(6))
+
+
+def test_fusion_cached_without_uri():
+    double = LocalPythonFunction(lambda x: 2 * x, batched=lambda x: [2 * xi for xi in x])
+    add = LocalPythonFunction(lambda a, b: a + b)
+
+    with execution_context(cached=True):
+        assert execute_fused([double(1), double(2)]) == [2, 4]
+        assert default_execute_to_value(add(double(1), double(2))) == 6
+
+
+def test_fusion_inherited_cache_policy():
+    double = LocalPythonFunction(lambda x: 2 * x, batched=lambda x: [2 * xi for xi in x])
+    inc = LocalPythonFunction(lambda x: x + 1)
+    add = LocalPythonFunction(lambda a, b, c: a + b + c)
+
+    # functions without URI are not cached when the policy is inherited, fused or not
+    with execution_context(cached=True):
+        assert execute_fused([double(1), double(2), inc(3)]) == [2, 4, 4]
+
+    with execution_context(pool=ThreadPoolExecutor(4)):
+        assert default_execute_to_value(add(double(1), double(2), inc(3))) == 10
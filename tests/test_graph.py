@@ -0,0 +1,39 @@
+from odafunction import LocalPythonFunction
+from odafunction.executors import default_execute_to_value
+from odafunction.executors.graph import GraphEvaluator, evaluate_graph
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def test_graph_deep_chain():
+    increment = LocalPythonFunction(lambda x: x + 1)
+
+    fg = increment(0)
+    for _ in range(2000):
+        fg = increment(fg)
+
+    assert evaluate_graph(fg) == 2001
+
+
+def test_graph_common_subexpressions():
+    calls = []
+
+    def expensive(x):
+        calls.append(x)
+        return x * 10
+
+    f_expensive = LocalPythonFunction(expensive)
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+    add = LocalPythonFunction(lambda x, y, z=0: x + y + z)
+
+    # expensive(1) appears three times, twice as distinct but identical objects
+    shared = f_expensive(1)
+    fg = add(shared, add(shared, f_expensive(1)), z=f_add(1, 2, 3))
+
+    evaluator = GraphEvaluator()
+    assert evaluator.evaluate(fg) == 10 + 10 + 10 + 6
+    assert calls == [1]
+    assert evaluator.n_executed == 4
+
+    calls.clear()
+    assert default_execute_to_value(fg) == 36
+    assert calls == [1, 1, 1]
@@ -0,0 +1,128 @@
+import http.server
+import json
+import tempfile
+import threading
+import time
+
+import pytest
+
+from odafunction.executors import LocalURICachingExecutor, default_execute_to_value
+from odafunction.executors.fusion import execute_fused
+from odafunction.func.httpapifunc import URIHTTPAPIFunction, RateLimiter
+from odafunction.func.urifunc import URIFunction
+
+
+class SquareHandler(http.server.BaseHTTPRequestHandler):
+    # keep-alive
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        self.server.requests.append(self.path)
+        self.server.clients.add(self.client_address)
+
+        if self.path == "/api/flaky" and len([r for r in self.server.requests if r == self.path]) == 1:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path in ["/api/square", "/api/flaky"]:
+            body = data['x'] ** 2
+        elif self.path == "/api/square/batch":
+            body = [d['x'] ** 2 for d in data]
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def square_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SquareHandler)
+    server.requests = []
+    server.clients = set()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server, f"127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_httpapi_function(square_server):
+    server, address = square_server
+
+    f = URIFunction.from_uri(f"httpapi+http://{address}/api::square")
+    assert isinstance(f, URIHTTPAPIFunction)
+    assert f.url == f"http://{address}/api/square"
+
+    assert default_execute_to_value(f(x=3)) == 9
+    assert f(x=3).uri == f(x=3).uri != f(x=4).uri
+
+    assert f.call_many([{'x': i} for i in range(20)]) == [i ** 2 for i in range(20)]
+
+    # connections are reused
+    assert len(server.clients) <= URIHTTPAPIFunction.max_concurrency
+
+    with pytest.raises(RuntimeError):
+        default_execute_to_value(URIFunction.from_uri(f"httpapi+http://{address}/api::cube")(x=3))
+
+
+def test_httpapi_cached_and_batched(square_server):
+    server, address = square_server
+
+    f = URIHTTPAPIFunction(f"httpapi+http://{address}/api::square", parameters=["x"], batch_url=f"http://{address}/api/square/batch")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+
+        assert ex(f(x=2)).value == 4
+        assert ex(f(x=2)).value == 4
+        assert server.requests == ["/api/square"]
+
+        assert execute_fused([f(x=i) for i in range(5)], cached=True, caching_executor=ex) == [0, 1, 4, 9, 16]
+        assert server.requests == ["/api/square", "/api/square/batch"]
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=50, burst=1)
+
+    t0 = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+
+    assert time.monotonic() - t0 >= 0.19
+
+
+def test_httpapi_retries_idempotent_only(square_server):
+    server, address = square_server
+
+    with pytest.raises(RuntimeError, match="503"):
+        default_execute_to_value(URIHTTPAPIFunction(f"httpapi+http://{address}/api::flaky")(x=3))
+
+    assert server.requests == ["/api/flaky"]
+
+    server.requests.clear()
+
+    f = URIHTTPAPIFunction(f"httpapi+http://{address}/api::flaky", idempotent=True)
+    assert default_execute_to_value(f(x=3)) == 9
+    assert server.requests == ["/api/flaky", "/api/flaky"]
+
+    # functions of the same host with other settings do not share them
+    assert f.host is not URIHTTPAPIFunction(f"httpapi+http://{address}/api::square").host
+    assert f.host is URIHTTPAPIFunction(f"httpapi+http://{address}/api::square", idempotent=True).host
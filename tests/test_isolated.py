@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from odafunction import LocalPythonFunction
+from odafunction.executors.isolated import IsolatedExecutor, IsolatedExecutionError
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def test_isolated_success():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    ex = IsolatedExecutor(timeout=30, memory_limit=100 * 1024 * 1024, cpu_limit=10)
+    r = ex(f_add(1, 2, 3))
+
+    assert r.value == 6
+    assert r.resource_usage['reason'] == 'ok'
+    assert r.resource_usage['peak_memory'] > 0
+    assert r.resource_usage['cpu_time'] >= 0
+
+
+def test_isolated_timeout():
+    t0 = time.time()
+
+    with pytest.raises(IsolatedExecutionError) as e:
+        IsolatedExecutor(timeout=0.5)(LocalPythonFunction(lambda: time.sleep(30))())
+
+    assert e.value.reason == 'timeout'
+    assert time.time() - t0 < 10
+
+
+def test_isolated_memory_limit():
+    with pytest.raises(IsolatedExecutionError) as e:
+        IsolatedExecutor(memory_limit=50 * 1024 * 1024)(LocalPythonFunction(lambda: len(bytearray(500 * 1024 * 1024)))())
+
+    assert e.value.reason == 'memory'
+
+
+def test_isolated_cpu_limit():
+    def busy():
+        while True:
+            pass
+
+    with pytest.raises(IsolatedExecutionError) as e:
+        IsolatedExecutor(timeout=30, cpu_limit=1)(LocalPythonFunction(busy)())
+
+    assert e.value.reason == 'cpu'
+
+
+def test_isolated_exception():
+    with pytest.raises(IsolatedExecutionError) as e:
+        IsolatedExecutor()(LocalPythonFunction(lambda: 1 / 0)())
+
+    assert e.value.reason == 'exception'
+    assert 'ZeroDivisionError' in e.value.report['error']
@@ -0,0 +1,43 @@
+from odafunction import LocalPythonFunction
+from odafunction.executors import LocalExecutor, default_execute_to_value
+from odafunction.executors.memo import MemoStore, memo_store
+
+
+def test_memoized_local_function():
+    calls = []
+
+    def helper(x, scale=1):
+        calls.append(x)
+        return x * scale
+
+    f = LocalPythonFunction(helper, memoize=True)
+    memo_store.clear()
+
+    assert [default_execute_to_value(f(i % 3, scale=2)) for i in range(9)] == [0, 2, 4] * 3
+    assert calls == [0, 1, 2]
+
+    report = memo_store.report()
+    assert report['hits'] == 6
+    assert report['misses'] == 3
+    assert report['by_function']['test_memoized_local_function.<locals>.helper']['hit_rate'] == 6 / 9
+
+    # not opted in
+    g = LocalPythonFunction(helper)
+    default_execute_to_value(g(0))
+    default_execute_to_value(g(0))
+    assert calls == [0, 1, 2, 0, 0]
+
+
+def test_memo_store_bounded():
+    memo = MemoStore(maxsize=2)
+    f = LocalPythonFunction(lambda x: x, memoize=True)
+
+    for i in range(3):
+        memo.put(memo.key(f(i)), f(i), i)
+
+    assert len(memo) == 2
+    assert memo.get(memo.key(f(0)), f(0)) == (False, None)
+    assert memo.get(memo.key(f(2)), f(2)) == (True, 2)
+
+    # arguments which can not be hashed are not memoized
+    assert memo.key(f(object())) is None
@@ -0,0 +1,54 @@
+import functools
+import http.server
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from odafunction.cli import main
+from odafunction.executors import default_execute_to_value
+from odafunction.func.mirror import FunctionMirror, source_url
+from odafunction.func.urifunc import URIPythonFunction
+
+
+@pytest.fixture
+def test_data_server():
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory="tests/test_data")
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_source_url():
+    assert source_url("ipynb+https://example.org/a/func.ipynb@oda_version=v1") == "https://example.org/a/func.ipynb"
+    assert source_url("https://example.org/a/func.py::examplefunc") == "https://example.org/a/func.py"
+
+
+def test_prefetch_and_serve_from_mirror(test_data_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("ODAFUNCTION_MIRROR", str(tmp_path / "mirror"))
+    server, base = test_data_server
+
+    result = CliRunner().invoke(main, ["prefetch", f"{base}/filewithfunc.py::examplefunc", f"ipynb+{base}/func.ipynb", "file://tests/test_data/filewithfunc.py"])
+    assert result.exit_code == 0, result.output
+
+    mirror = FunctionMirror()
+    assert len(list(mirror.records())) == 2
+    assert mirror.record(f"{base}/filewithfunc.py")['revision'].get('last-modified') is not None
+
+    # remote is gone, but mirror has certified copy
+    server.shutdown()
+    server.server_close()
+
+    f = URIPythonFunction(f"{base}/filewithfunc.py::examplefunc")
+    assert default_execute_to_value(f(1, 2, 3)) == 6
+
+    # tampered copy is not used
+    with open(mirror.object_path(mirror.record(f"{base}/filewithfunc.py")['sha256']), "ab") as fobj:
+        fobj.write(b"\n")
+
+    assert mirror.get(f"{base}/filewithfunc.py") is None
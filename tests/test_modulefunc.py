@@ -0,0 +1,85 @@
+import inspect
+import os.path
+import tempfile
+import types
+
+import pytest
+
+from odafunction.executors import LocalURICachingExecutor, default_execute_to_value
+from odafunction.func.bytecode import BytecodeCache
+from odafunction.func.modulefunc import URIModuleFunction
+from odafunction.func.urifunc import URIFunction, URIPythonFunction
+
+
+def test_module_function():
+    f = URIFunction.from_uri("module://os.path::join")
+
+    assert isinstance(f, URIModuleFunction)
+    assert f.local_python_function is os.path.join
+
+    assert default_execute_to_value(f("a", "b")) == "a/b"
+    assert "module:" not in str(f("a", "b").uri)
+
+    # attribute path within module
+    f = URIFunction.from_uri("module://odafunction.func.modulefunc::URIModuleFunction.load_func")
+    assert f.local_python_function is URIModuleFunction.load_func
+
+    with pytest.raises(RuntimeError):
+        URIFunction.from_uri("module://odafunction.nosuchmodule::f")
+
+
+def test_module_function_cached():
+    f = URIFunction.from_uri("module://odafunction.func.urifunc::parse_uri_parts")
+    assert f.content_revision is not None
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+
+        r = ex(f("file://a/b.py::f"))
+        assert r.value['suffix'] == "py"
+        assert ex.lookup(f("file://a/b.py::f")) == r.uri
+
+
+def test_bytecode_cache(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = BytecodeCache(tmpdir)
+        monkeypatch.setattr(URIPythonFunction, "bytecode_cache", cache)
+
+        for _ in range(3):
+            f = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+            assert default_execute_to_value(f(1, 2, 3)) == 6
+
+        assert cache.n_compiled == 1
+
+        # new process would find it on disk
+        cache = BytecodeCache(tmpdir)
+        monkeypatch.setattr(URIPythonFunction, "bytecode_cache", cache)
+
+        URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+        assert cache.n_compiled == 0
+
+        # changed source is compiled again
+        with open(f"{tmpdir}/func.py", "w") as fd:
+            fd.write("def examplefunc(x):\n    return x\n")
+
+        assert default_execute_to_value(URIPythonFunction(f"file://{tmpdir}/func.py::examplefunc")(1)) == 1
+        assert cache.n_compiled == 1
+
+
+def test_bytecode_cache_file_names(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = BytecodeCache(f"{tmpdir}/cache")
+        monkeypatch.setattr(URIPythonFunction, "bytecode_cache", cache)
+
+        for name in ["a", "b"]:
+            with open(f"{tmpdir}/{name}.py", "w") as fd:
+                fd.write("def f(x):\n    return (lambda: x)()\n")
+
+        f_a = URIPythonFunction(f"file://{tmpdir}/a.py::f").local_python_function
+        f_b = URIPythonFunction(f"file://{tmpdir}/b.py::f").local_python_function
+
+        # same source is compiled once, but each function is from own file, also nested code
+        assert cache.n_compiled == 1
+        assert inspect.getsourcefile(f_a) == f"{tmpdir}/a.py"
+        assert inspect.getsourcefile(f_b) == f"{tmpdir}/b.py"
+        assert [c.co_filename for c in f_b.__code__.co_consts if isinstance(c, types.CodeType)] == [f"{tmpdir}/b.py"]
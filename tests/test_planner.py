@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import threading
+
+from odafunction import LocalPythonFunction
+from odafunction.executors import LocalURICachingExecutor, default_execute_to_value
+from odafunction.executors.planner import ExecutionPlanner, function_key
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def test_function_key():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    assert function_key(f_add(1, 2, 3)) == "file://tests/test_data/filewithfunc.py::examplefunc"
+    assert function_key(f_add(1, 2, 3)) == function_key(f_add(4, 5, 6))
+
+
+def test_planner_decisions():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        planner = ExecutionPlanner(f"{tmpdir}/stats.json", caching_executor=LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[]))
+
+        # nothing is known yet: compute and cache
+        assert default_execute_to_value(f_add(1, 2, 3), cached=True, planner=planner) == 6
+        assert planner.decisions[-1].action == 'compute-and-cache'
+        assert planner.stats[function_key(f_add(1, 2, 3))]['n_runs'] == 1
+
+        planner.cheap_runtime = 0
+        planner.cache_read_latency = 0
+        assert default_execute_to_value(f_add(1, 2, 3), cached=True, planner=planner) == 6
+        assert planner.decisions[-1].action == 'read-cache'
+        assert planner.decisions[-1].measured_costs['cache_read'] > 0
+
+        # the function is fast: new arguments are not worth caching
+        planner.cheap_runtime = 100
+        assert default_execute_to_value(f_add(1, 2, 4), cached=True, planner=planner) == 7
+        assert planner.decisions[-1].action == 'compute'
+        assert planner.decisions[-1].reason == "cheap to recompute, not worth caching"
+
+        assert default_execute_to_value(LocalPythonFunction(lambda x: x + 1)(1), cached=True, planner=planner) == 2
+        assert planner.decisions[-1].action == 'compute'
+
+        # statistics persist
+        assert ExecutionPlanner(f"{tmpdir}/stats.json").estimate(function_key(f_add(1, 2, 3)))['runtime'] is not None
+
+
+def test_planner_concurrent_records():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        planners = [ExecutionPlanner(f"{tmpdir}/stats.json", caching_executor=LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])) for _ in range(2)]
+
+        def run(planner):
+            for _ in range(50):
+                planner.record("f", runtime=1.)
+                planner.save_stats()
+
+        threads = [threading.Thread(target=run, args=(planner,)) for planner in planners for _ in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        assert [planner.stats["f"]["n_runs"] for planner in planners] == [200, 200]
+
+        with open(f"{tmpdir}/stats.json") as f:
+            assert json.load(f)["f"]["n_runs"] == 200
+
+        assert os.listdir(tmpdir) == ["stats.json"]
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from click.testing import CliRunner
+
+from odafunction import LocalPythonFunction
+from odafunction.cli import main
+from odafunction.context import execution_context
+from odafunction.executors import default_execute_to_value
+from odafunction.executors.profiling import ProfileStore
+from odafunction.func.urifunc import URIPythonFunction
+
+
+def slow(x):
+    time.sleep(0.05)
+    return [x] * 100000
+
+
+def test_profile_executions(tmpdir, monkeypatch):
+    monkeypatch.setenv("ODAFUNCTION_PROFILES", str(tmpdir))
+
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+    f_slow = LocalPythonFunction(slow)
+
+    # not recorded unless asked
+    default_execute_to_value(f_add(1, 2, 3))
+    assert list(ProfileStore().entries()) == []
+
+    with execution_context(profile="memory"):
+        assert default_execute_to_value(f_add(1, 2, 3)) == 6
+        assert len(default_execute_to_value(f_slow(1))) == 100000
+
+        # nested execution is part of the outer profile
+        default_execute_to_value(f_add(len(f_slow(2).local_python_function()), 2, 3))
+
+    entries = ProfileStore().slowest()
+    assert len(entries) == 3
+
+    assert entries[0]['function'].endswith("test_profiling.slow")
+    assert entries[0]['duration'] >= 0.05
+    assert entries[0]['memory']['total'] > 0
+    assert str(f_add(1, 2, 3).uri) in [e['uri'] for e in entries]
+
+    assert "slow" in ProfileStore().report(entries[0]['profile'])
+
+    result = CliRunner().invoke(main, ["profiles", "list", "-n", "1"])
+    assert result.exit_code == 0, result.output
+    assert entries[0]['profile'] in result.output
+
+    result = CliRunner().invoke(main, ["profiles", "show", "0"])
+    assert result.exit_code == 0, result.output
+    assert "cumulative" in result.output
+
+
+def test_run_profile(tmpdir, monkeypatch):
+    monkeypatch.setenv("ODAFUNCTION_PROFILES", str(tmpdir / "profiles"))
+
+    with open(tmpdir / "func.py", "w") as f:
+        f.write("def f():\n    return sum(range(100000))\n")
+
+    result = CliRunner().invoke(main, ["run", "-nc", "--profile", f"file://{tmpdir}/func.py::f"])
+    assert result.exit_code == 0, result.output
+
+    entries = list(ProfileStore().entries())
+    assert len(entries) == 1
+    assert 'memory' not in entries[0]
+
+
+def test_profile_overlapping_threads(tmpdir, monkeypatch):
+    monkeypatch.setenv("ODAFUNCTION_PROFILES", str(tmpdir))
+
+    barrier = threading.Barrier(2)
+
+    def waiting(x):
+        barrier.wait(5)
+        time.sleep(0.05)
+        return x
+
+    f = LocalPythonFunction(waiting)
+    results = []
+
+    def execute(x):
+        with execution_context(profile="memory"):
+            results.append(default_execute_to_value(f(x)))
+
+    threads = [threading.Thread(target=execute, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(results) == [0, 1]
+
+    # one of them is only timed
+    entries = list(ProfileStore().entries())
+    assert len(entries) == 2
+    assert sorted(e['profile'] is None for e in entries) == [False, True]
+
+    result = CliRunner().invoke(main, ["profiles", "show", "5"])
+    assert result.exit_code == 1
+    assert "only 2 recorded profiles" in result.output
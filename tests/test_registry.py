@@ -0,0 +1,47 @@
+import pytest
+
+from odafunction.func.urifunc import (
+    URIFunction, URIPythonFunction, URIipynbFunction, URIValue, URIFileFunction,
+    parse_uri_parts, register_uri_function, resolve_uri_function_class, uri_function_registry,
+)
+
+
+@pytest.mark.parametrize("uri,cls", [
+    ("file://tests/test_data/filewithfunc.py::examplefunc", URIPythonFunction),
+    ("py+https://example.org/func.txt::examplefunc", URIPythonFunction),
+    ("ipynb+file://tests/test_data/func.ipynb@oda_version=v1", URIipynbFunction),
+    ("https://example.org/func.ipynb", URIipynbFunction),
+    ("file://urifile.data", URIValue),
+    ("https://example.org/urifile.data", None),
+    ("unknown+file://tests/test_data/filewithfunc.py::examplefunc", None),
+])
+def test_resolve_uri_function_class(uri, cls):
+    assert resolve_uri_function_class(parse_uri_parts(uri)) is cls
+
+
+def test_from_uri_loads_once(monkeypatch):
+    loaded = []
+
+    for cls in [URIPythonFunction, URIipynbFunction]:
+        original = cls.load_func_from_local_file
+        monkeypatch.setattr(cls, "load_func_from_local_file", lambda self, path, original=original, cls=cls: loaded.append(cls) or original(self, path))
+
+    f = URIFunction.from_uri("ipynb+file://tests/test_data/func.ipynb@oda_version=v1")
+
+    assert isinstance(f, URIipynbFunction)
+    assert loaded == [URIipynbFunction]
+
+
+def test_register_uri_function():
+    @register_uri_function(modifier="txt")
+    class URITextFunction(URIFileFunction):
+        def load_func_from_local_file(self, path):
+            with open(path) as f:
+                self.text = f.read()
+
+    try:
+        f = URIFunction.from_uri("txt+file://tests/test_data/filewithfunc.py")
+        assert isinstance(f, URITextFunction)
+        assert "examplefunc" in f.text
+    finally:
+        uri_function_registry.pop()
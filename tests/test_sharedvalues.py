@@ -0,0 +1,110 @@
+import gc
+import multiprocessing
+import os
+import pickle
+import tempfile
+
+import pytest
+
+from odafunction import LocalValue, LocalPythonFunction
+from odafunction.executors.isolated import IsolatedExecutor
+from odafunction import sharedvalues
+from odafunction.sharedvalues import SharedLocalValue, share_value, is_shareable, sweep_shared_values
+
+np = pytest.importorskip("numpy")
+
+
+def total(v):
+    # value is attached in the worker, not sent
+    return float(v.value.sum()), v.value.flags.writeable, os.getpid()
+
+
+def test_shared_value_lifetime():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.arange(1000000, dtype=np.float64).reshape(1000, 1000)
+
+        ref = share_value(a, tmpdir)
+
+        view = ref.attach()
+        assert (view == a).all()
+        assert not view.flags.writeable
+
+        assert not ref.release()
+        assert ref.exists
+
+        derived = view[10:20]
+        del view
+        gc.collect()
+        assert ref.exists
+
+        del derived
+        gc.collect()
+        assert not ref.exists
+
+        with pytest.raises(RuntimeError):
+            ref.attach()
+
+        # non-array buffers are attached as memoryview
+        ref = share_value(b"x" * 100, tmpdir)
+        assert bytes(ref.attach()) == b"x" * 100
+
+        # not released, so kept even without views
+        gc.collect()
+        assert sweep_shared_values(tmpdir) == 0
+        assert ref.exists
+
+
+def test_sweep_skips_incomplete(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # another process is creating it
+        open(f"{tmpdir}/incomplete.shm", "wb").close()
+
+        assert sweep_shared_values(tmpdir) == 0
+        assert os.path.exists(f"{tmpdir}/incomplete.shm")
+
+        sweeps = []
+        monkeypatch.setattr(sharedvalues, "sweep_shared_values", lambda directory=None: sweeps.append(directory))
+
+        refs = [share_value(b"x" * 100, tmpdir) for _ in range(3)]
+        assert len(sweeps) <= 1
+        assert sorted(os.listdir(tmpdir)) == sorted(["incomplete.shm"] + [os.path.basename(ref.path) for ref in refs])
+
+
+def test_shared_local_value_in_pool():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.ones(2000000)
+        v = SharedLocalValue.from_value(LocalValue(a, provenance=[('test',)]), directory=tmpdir)
+
+        assert v.provenance == [('test',)]
+        assert len(pickle.dumps(v)) < 1000
+
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            results = pool.map(total, [v] * 4)
+
+        assert {r[:2] for r in results} == {(2000000.0, False)}
+        assert os.getpid() not in {r[2] for r in results}
+
+        v.release()
+        gc.collect()
+        assert os.listdir(tmpdir) == []
+
+
+def test_isolated_large_result_shared():
+    assert not is_shareable([1, 2, 3])
+    assert is_shareable(np.ones(1000000))
+
+    def large():
+        return np.full(1000000, 3.0)
+
+    ex = IsolatedExecutor(timeout=30)
+    r = ex(LocalPythonFunction(large))
+
+    assert 'shared' in ex.last_report
+    assert r.value.sum() == 3000000.0
+
+    path = ex.last_report['shared']
+    assert os.path.exists(path)
+
+    del r
+    gc.collect()
+    assert not os.path.exists(path)
@@ -0,0 +1,111 @@
+import tempfile
+import threading
+
+import pytest
+
+from odafunction import LocalPythonFunction
+from odafunction.executors import LocalURICachingExecutor, LocalURIExecutor
+from odafunction.executors.cachetiers import CacheTier, portable_key
+from odafunction.func.urifunc import StreamedValue, URIPythonFunction, URIValue
+
+
+def test_stream_urivalue():
+    produced = []
+
+    def items():
+        for i in range(5):
+            produced.append(i)
+            yield i
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        v = URIValue(f"file://{tmpdir}/stream.data", value=items())
+
+        assert isinstance(v.value, StreamedValue)
+        assert produced == [0, 1, 2, 3, 4]
+        assert list(v.value) == [0, 1, 2, 3, 4]
+
+        # lazily iterable again, also when loaded from URI
+        assert list(URIValue(f"file://{tmpdir}/stream.data").value) == [0, 1, 2, 3, 4]
+
+
+def test_stream_generator_failure():
+    def items():
+        yield 1
+        raise RuntimeError("failed in the middle")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(RuntimeError):
+            URIValue(f"file://{tmpdir}/stream.data", value=items())
+
+        with pytest.raises(FileNotFoundError):
+            URIValue(f"file://{tmpdir}/stream.data")
+
+
+def test_stream_cached_generator_function():
+    f = URIPythonFunction("file://tests/test_data/streamfunc.py::count_items")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = LocalURICachingExecutor(f"{tmpdir}/memory.ttl", tiers=[])
+
+        v = ex(f(1000)).value
+        assert isinstance(v, StreamedValue)
+        assert sum(item["square"] for item in v) == sum(i * i for i in range(1000))
+
+        v = ex(f(1000)).value
+        assert isinstance(v, StreamedValue)
+        assert next(iter(v)) == {"i": 0, "square": 0}
+
+    v = LocalURIExecutor()(LocalPythonFunction(lambda: (i for i in range(3)))()).value
+    assert list(v) == [0, 1, 2]
+
+
+def test_stream_header_is_not_json():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        value = {"odafunction_stream": 1, "x": 2}
+        URIValue(f"file://{tmpdir}/dict.data", value=value)
+        assert URIValue(f"file://{tmpdir}/dict.data").value == value
+
+        URIValue(f"file://{tmpdir}/one.data", value={"odafunction_stream": 1})
+        assert URIValue(f"file://{tmpdir}/one.data").value == {"odafunction_stream": 1}
+
+
+def test_stream_concurrent_writers():
+    def items():
+        for i in range(1000):
+            yield i
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        errors = []
+
+        def write():
+            try:
+                URIValue(f"file://{tmpdir}/stream.data", value=items())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert list(URIValue(f"file://{tmpdir}/stream.data").value) == list(range(1000))
+
+
+def test_stream_published_to_tier():
+    f = URIPythonFunction("file://tests/test_data/streamfunc.py::count_items")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex_a = LocalURICachingExecutor(f"{tmpdir}/memory-a.ttl", tiers=[f"{tmpdir}/shared:rw"])
+        assert len(list(ex_a(f(10)).value)) == 10
+
+        found, v = CacheTier(f"{tmpdir}/shared").lookup(portable_key(f(10).uri))
+        assert found
+        assert isinstance(v, StreamedValue)
+        assert list(v)[-1] == {"i": 9, "square": 81}
+
+        ex_b = LocalURICachingExecutor(f"{tmpdir}/memory-b.ttl", tiers=[f"{tmpdir}/shared"])
+        v = ex_b(f(10)).value
+        assert isinstance(v, StreamedValue)
+        assert len(list(v)) == 10
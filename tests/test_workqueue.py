@@ -0,0 +1,99 @@
+import tempfile
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from odafunction.cli import main
+from odafunction.executors.workqueue import QueueExecutor, run_worker, job_from_function, open_job_queue
+from odafunction.func.urifunc import URIPythonFunction, URIValue
+
+
+@pytest.mark.parametrize("queue_name", ["queue", "queue.sqlite"])
+def test_queue_executor(queue_name):
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    assert job_from_function(f_add(1, 2, z=3)) == {'uri': 'file://tests/test_data/filewithfunc.py::examplefunc', 'args': [1, 2], 'kwargs': {'z': 3}}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = QueueExecutor(f"{tmpdir}/{queue_name}", poll_interval=0.05, timeout=30)
+
+        job_ids = [ex.submit(f_add(i, 2, 3)) for i in range(3)]
+
+        worker = threading.Thread(target=run_worker, args=(f"{tmpdir}/{queue_name}",), kwargs=dict(cached=False, max_jobs=3, poll_interval=0.05))
+        worker.start()
+
+        values = [ex.wait(job_id) for job_id in job_ids]
+        worker.join()
+
+    assert all(isinstance(v, URIValue) for v in values)
+    assert [v.value for v in values] == [5, 6, 7]
+
+
+def test_queue_worker_cli():
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = QueueExecutor(tmpdir, poll_interval=0.05, timeout=30)
+        job_id = ex.submit(f_add(10, 2, 3))
+
+        result = CliRunner().invoke(main, ["worker", tmpdir, "-nc", "--max-jobs", "1"])
+        assert result.exit_code == 0, result.output
+
+        assert ex.wait(job_id).value == 15
+
+
+@pytest.mark.parametrize("queue_name", ["queue", "queue.sqlite"])
+def test_queue_expired_lease(queue_name):
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ex = QueueExecutor(f"{tmpdir}/{queue_name}", poll_interval=0.05, timeout=30)
+        job_id = ex.submit(f_add(1, 2, 3))
+
+        # worker claims the job and dies
+        dead_worker_queue = open_job_queue(f"{tmpdir}/{queue_name}", lease_time=0.2)
+        assert dead_worker_queue.claim()[0] == job_id
+        assert dead_worker_queue.claim() is None
+
+        time.sleep(0.3)
+
+        assert run_worker(f"{tmpdir}/{queue_name}", cached=False, max_jobs=1, poll_interval=0.05, lease_time=0.2) == 1
+        assert ex.wait(job_id).value == 6
+
+
+@pytest.mark.parametrize("queue_name", ["queue", "queue.sqlite"])
+def test_queue_lease_of_holder(queue_name):
+    f_add = URIPythonFunction("file://tests/test_data/filewithfunc.py::examplefunc")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        QueueExecutor(f"{tmpdir}/{queue_name}").submit(f_add(1, 2, 3))
+
+        assert open_job_queue(f"{tmpdir}/{queue_name}", lease_time=60).claim() is not None
+
+        time.sleep(0.2)
+
+        # worker with short lease does not take the job of one with long lease
+        assert open_job_queue(f"{tmpdir}/{queue_name}", lease_time=0.1).claim() is None
+
+
+def test_queue_lease_renewed():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(f"{tmpdir}/sleepy.py", "w") as f:
+            f.write("import time\ndef sleepy(t):\n    time.sleep(t)\n    return t\n")
+
+        f_sleep = URIPythonFunction(f"file://{tmpdir}/sleepy.py::sleepy")
+        ex = QueueExecutor(f"{tmpdir}/queue", poll_interval=0.05, timeout=30)
+        job_id = ex.submit(f_sleep(1.))
+
+        worker = threading.Thread(target=run_worker, args=(f"{tmpdir}/queue",), kwargs=dict(cached=False, max_jobs=1, poll_interval=0.05, lease_time=0.3))
+        worker.start()
+
+        time.sleep(0.7)
+
+        # job runs longer than the lease, but is not given away
+        assert open_job_queue(f"{tmpdir}/queue", lease_time=0.3).claim() is None
+
+        worker.join()
+        assert ex.wait(job_id).value == 1.